@@ -1,6 +1,16 @@
+TOR_HOST = '127.0.0.1'
+# One SOCKS port per entry; add more 'SocksPort' lines to torrc to spread workers over them
+TOR_SOCKS_PORTS = [9050]
+TOR_CONTROL_PORT = 9051
+TOR_CONTROL_PASSWORD = None
+TOR_STREAM_ISOLATION = True
+CIRCUIT_MAX_ERROR_RATE = 0.5
+CIRCUIT_MAX_LATENCY = 30
+NEWNYM_INTERVAL = 10
+
 TOR_PROXY = {
-    'http': 'socks5h://127.0.0.1:9050',
-    'https': 'socks5h://127.0.0.1:9050'
+    'http': f'socks5h://{TOR_HOST}:{TOR_SOCKS_PORTS[0]}',
+    'https': f'socks5h://{TOR_HOST}:{TOR_SOCKS_PORTS[0]}'
 }
 
 USER_AGENTS = [
@@ -12,3 +22,36 @@ USER_AGENTS = [
 KEYWORDS = {'bitcoin', 'hacking', 'market', 'drugs','carding','fraud','scam','hack','wiki','forum'}
 MAX_DEPTH = 2
 CRAWL_LIMIT = 50
+CRAWL_WORKERS = 4
+POLITENESS_DELAY = 3
+# 'auto' fetches over plain HTTP and escalates to Firefox for JS-rendered pages
+# or when a screenshot is required; 'http' and 'browser' force a single tier.
+FETCH_MODE = 'auto'
+CAPTURE_SCREENSHOTS = True
+HTTP_TIMEOUT = 30
+HTTP_POOL_SIZE = 10
+# Browser page loads: per-host timeouts adapt to observed load times within these bounds
+PAGE_LOAD_TIMEOUT_MIN = 10
+PAGE_LOAD_TIMEOUT_MAX = 60
+PAGE_READY_QUIET = 0.5
+DRIVER_CRASH_REQUEUES = 1
+# Blacklist feeds: plain lists (.txt), CSV (domain,tag,severity) or JSON; reloaded when modified
+THREAT_FEEDS = ['tools/feeds.txt']
+FEED_CHECK_INTERVAL = 5
+RESULTS_DB = 'outputs/results.db'
+# Persistent crawl frontier used by --resume
+CRAWL_STATE_DB = 'outputs/crawl_state.db'
+CHECKPOINT_INTERVAL = 30
+FRONTIER_BUFFER = 1000
+BLOOM_CAPACITY = 10000000
+BLOOM_ERROR_RATE = 0.001
+# Near-duplicate pages (SimHash within this many bits) skip analysis and screenshots
+SIMHASH_DISTANCE = 3
+DEDUP_MIN_TOKENS = 10
+# Link prioritization: caps per URL pattern (ids/tokens masked) and per host
+MAX_URLS_PER_PATTERN = 20
+MAX_URLS_PER_TOKEN_PATTERN = 3
+MAX_URLS_PER_HOST = 500
+# Sampling profiler behind /profile; can also be toggled at runtime
+PROFILER_ENABLED = False
+PROFILER_INTERVAL = 0.01
@@ -1,16 +1,134 @@
-import re
-from bs4 import BeautifulSoup
+from collections import deque
+from urllib.parse import urljoin
+import lxml.html
+from lxml import etree
+
+INVISIBLE_TAGS = ('script', 'style', 'noscript', 'template')
+
+def _is_word_char(ch):
+    return ch.isalnum() or ch == '_'
+
+def _lower(text):
+    # Lowercase without changing the length, so offsets stay valid in the
+    # original text; a few characters (e.g. 'İ') lowercase to two code points.
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(ch.lower()[0] for ch in text)
+
+class KeywordMatcher:
+    """Aho-Corasick matcher over a keyword watchlist.
+
+    The automaton is built once, so scanning a page costs one pass over its
+    text no matter how many keywords are watched. Matching is
+    case-insensitive and keeps regex \\b semantics: a keyword edge that is a
+    word character must not touch another word character in the text.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({kw for kw in keywords if kw})
+        self.patterns = [_lower(kw) for kw in self.keywords]
+        self.goto = [{}]
+        self.fail = [0]
+        self.outputs = [[]]
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for ch in pattern:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][ch] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.outputs.append([])
+                state = next_state
+            self.outputs[state].append(index)
+        self._build_failure_links()
+
+    def _build_failure_links(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.outputs[next_state] = self.outputs[next_state] + self.outputs[self.fail[next_state]]
+
+    def find(self, text):
+        """Return {keyword: [start offsets]} for every whole-word match in text."""
+        content = _lower(text)
+        length = len(content)
+        goto, fail, outputs, patterns = self.goto, self.fail, self.outputs, self.patterns
+        found = {}
+        state = 0
+        for end, ch in enumerate(content, 1):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            for index in outputs[state]:
+                pattern = patterns[index]
+                start = end - len(pattern)
+                if _is_word_char(pattern[0]) and start > 0 and _is_word_char(content[start - 1]):
+                    continue
+                if _is_word_char(pattern[-1]) and end < length and _is_word_char(content[end]):
+                    continue
+                found.setdefault(self.keywords[index], []).append(start)
+        return found
+
+_MATCHERS = {}
+
+def get_matcher(keywords):
+    key = frozenset(keywords)
+    matcher = _MATCHERS.get(key)
+    if matcher is None:
+        matcher = _MATCHERS[key] = KeywordMatcher(key)
+    return matcher
+
+def parse_page(html, base_url=''):
+    """Parse html once and return its title, meta tags, absolute links and visible text."""
+    result = {'title': '', 'meta': {}, 'links': [], 'text': ''}
+    if not html or not html.strip():
+        return result
+    try:
+        try:
+            doc = lxml.html.fromstring(html)
+        except ValueError:
+            # lxml refuses str input that carries an XML encoding declaration
+            doc = lxml.html.fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return result
+
+    title = doc.find('.//title')
+    if title is not None:
+        result['title'] = title.text_content()
+    for meta in doc.iter('meta'):
+        name, content = meta.get('name'), meta.get('content')
+        if name and content:
+            result['meta'][name.lower()] = content
+    links = {}
+    for anchor in doc.iter('a'):
+        href = anchor.get('href')
+        if not href:
+            continue
+        try:
+            links.setdefault(urljoin(base_url, href.strip()), None)
+        except ValueError:
+            # e.g. an unterminated IPv6 host; drop only this link
+            continue
+    result['links'] = list(links)
+
+    etree.strip_elements(doc, *INVISIBLE_TAGS, with_tail=False)
+    # Join text nodes with a space so adjacent blocks do not fuse into one word
+    result['text'] = ' '.join(' '.join(doc.itertext()).split())
+    return result
 
 def search_keywords(html, keywords):
-    found = {}
-    content = html.lower()
-    for kw in keywords:
-        if re.search(r'\b' + re.escape(kw.lower()) + r'\b', content):
-            found[kw] = True
-    return found
+    return {kw: True for kw in get_matcher(keywords).find(html)}
 
 def extract_metadata(html):
-    soup = BeautifulSoup(html, 'html.parser')
-    title = soup.title.string if soup.title else ''
-    metas = {meta.get('name', '').lower(): meta.get('content', '') for meta in soup.find_all('meta') if meta.get('name') and meta.get('content')}
-    return {'title': title, 'meta': metas}
+    parsed = parse_page(html)
+    return {'title': parsed['title'], 'meta': parsed['meta']}
@@ -1,95 +1,490 @@
+import heapq
 import logging
+import threading
 import time
 import random
+import requests
+from functools import partial
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
 from selenium.common.exceptions import TimeoutException, WebDriverException
-from urllib.parse import urljoin
-from config import MAX_DEPTH, CRAWL_LIMIT, USER_AGENTS
+from urllib.parse import urlparse
+from config import (MAX_DEPTH, CRAWL_LIMIT, USER_AGENTS, CRAWL_WORKERS, POLITENESS_DELAY, FETCH_MODE,
+                    CAPTURE_SCREENSHOTS, PAGE_LOAD_TIMEOUT_MIN, PAGE_LOAD_TIMEOUT_MAX, PAGE_READY_QUIET,
+                    DRIVER_CRASH_REQUEUES, FRONTIER_BUFFER)
+from core.analyzer import parse_page
+from core.frontier import CrawlState
+from core.prioritizer import LinkPrioritizer
+from core.http_fetch import HttpFetcher, looks_js_rendered
+from core.metrics import span, PAGES, FETCH_RETRIES, DRIVER_RESTARTS, FRONTIER_URLS, IN_FLIGHT
+from core.transport import TRANSPORT
 from core.utils import get_random_user_agent, is_valid_onion_url, normalize_url
 
-CRAWLED_URLS = set()
+# Polled while a page settles: the document state plus DOM size and number of
+# fetched resources, which stop changing once the page is quiescent.
+READY_STATE_SCRIPT = (
+    "return [document.readyState, document.getElementsByTagName('*').length, "
+    "(window.performance && performance.getEntriesByType) ? performance.getEntriesByType('resource').length : 0];"
+)
+
+class DriverCrashed(Exception):
+    """Raised after a dead browser session was restarted; the URL should be re-queued."""
+
+class HostTimings:
+    """Per-host page load timeouts learned from observed load times."""
+
+    def __init__(self, minimum=PAGE_LOAD_TIMEOUT_MIN, maximum=PAGE_LOAD_TIMEOUT_MAX, factor=3.0, alpha=0.3):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.factor = factor
+        self.alpha = alpha
+        self.averages = {}
+        self.lock = threading.Lock()
+
+    def observe(self, host, seconds):
+        with self.lock:
+            previous = self.averages.get(host)
+            self.averages[host] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def timeout(self, host):
+        average = self.averages.get(host)
+        if average is None:
+            return self.maximum
+        return min(max(average * self.factor, self.minimum), self.maximum)
+
+HOST_TIMINGS = HostTimings()
 
 class TorCrawler:
-    def __init__(self):
+    def __init__(self, fetch_mode=FETCH_MODE, screenshots=CAPTURE_SCREENSHOTS, timings=HOST_TIMINGS,
+                 transport=TRANSPORT):
+        self.fetch_mode = fetch_mode
+        self.screenshots = screenshots
+        self.timings = timings
+        self.transport = transport
+        self.circuit = transport.acquire()
+        self.circuit_generation = self.circuit.generation
+        self.http = HttpFetcher(proxies=self.circuit.proxies())
+        self.driver = None
+        self.driver_failed = False
+
         self.options = Options()
         self.options.headless = True
         self.options.set_preference('network.proxy.type', 1)
-        self.options.set_preference('network.proxy.socks', '127.0.0.1')
-        self.options.set_preference('network.proxy.socks_port', 9050)
+        self.options.set_preference('network.proxy.socks', self.circuit.host)
+        self.options.set_preference('network.proxy.socks_port', self.circuit.socks_port)
         self.options.set_preference("network.proxy.socks_remote_dns", True)
         self.options.set_preference("dom.webdriver.enabled", False)
         self.options.set_preference('useAutomationExtension', False)
+        # Return after DOMContentLoaded; wait_until_ready decides when the page has settled
+        self.options.page_load_strategy = 'eager'
 
         # Set random user agent
         user_agent = random.choice(USER_AGENTS)
         self.options.set_preference("general.useragent.override", user_agent)
 
+    def get_driver(self):
+        # Firefox is only started once a page actually needs it.
+        if self.driver or self.driver_failed:
+            return self.driver
         try:
             self.driver = webdriver.Firefox(options=self.options)
-            self.driver.set_page_load_timeout(30)
+            self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT_MAX)
         except Exception as e:
             logging.error(f"Failed to start Firefox webdriver: {e}")
-            self.driver = None
+            self.driver_failed = True
+        return self.driver
 
-    def fetch_page(self, url, retries=3):
+    def is_healthy(self):
         if not self.driver:
+            return False
+        try:
+            self.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def restart_driver(self):
+        logging.warning("Restarting dead Firefox session")
+        if self.driver:
+            try:
+                self.driver.quit()
+            except Exception:
+                pass
+        self.driver = None
+        self.driver_failed = False
+        DRIVER_RESTARTS.inc()
+        return self.get_driver()
+
+    def wait_until_ready(self, driver, deadline, poll=0.1):
+        # Ready once the document is complete and the DOM and resource counts
+        # have not changed for PAGE_READY_QUIET seconds.
+        last_snapshot = None
+        stable_since = time.monotonic()
+        while True:
+            state, nodes, resources = driver.execute_script(READY_STATE_SCRIPT)
+            now = time.monotonic()
+            snapshot = (nodes, resources)
+            if snapshot != last_snapshot:
+                last_snapshot = snapshot
+                stable_since = now
+            elif state == 'complete' and now - stable_since >= PAGE_READY_QUIET:
+                return True
+            if now >= deadline:
+                return False
+            time.sleep(poll)
+
+    def fetch_page(self, url, retries=3):
+        """Fetch url once and return a page dict, or None on failure.
+
+        The dict holds the html, the final url and title, which tier served
+        it and, with screenshots enabled, a 'capture' callable that returns
+        a base64 PNG. It must be called before this session fetches its
+        next page. For pages fetched over HTTP in auto mode, capture loads
+        the page in Firefox and replaces html, title and 'parsed' with that
+        render, so the analysis and the screenshot describe the same load.
+        """
+        if self.fetch_mode != 'browser':
+            html = self.fetch_http(url, retries)
+            if html is None:
+                return None
+            if self.fetch_mode == 'http' or not looks_js_rendered(html):
+                page = self.make_page(url, html, via='http')
+                if self.screenshots and self.fetch_mode == 'auto':
+                    # Firefox only opens the page if the caller actually wants its screenshot
+                    page['capture'] = partial(self.render_and_capture, page)
+                return page
+            logging.info(f"{url} looks JS-rendered, escalating to browser")
+            try:
+                page = self.fetch_browser(url, retries)
+            except DriverCrashed:
+                page = None
+            if page is None:
+                # The static HTML still has the title, text and links; better than losing the page
+                logging.warning(f"Browser could not render {url}, keeping the HTTP response")
+                return self.make_page(url, html, via='http')
+            return page
+        return self.fetch_browser(url, retries)
+
+    def make_page(self, url, html, via, final_url=None, title='', capture=None):
+        return {
+            'url': url,
+            'final_url': final_url or url,
+            'html': html,
+            'title': title,
+            'via': via,
+            'capture': capture,
+        }
+
+    def sync_circuit(self):
+        # The pool renews a degraded circuit in place: new credentials, possibly on another port
+        if self.circuit.generation == self.circuit_generation:
+            return
+        self.circuit_generation = self.circuit.generation
+        self.http.session.proxies.update(self.circuit.proxies())
+        if self.options.preferences.get('network.proxy.socks_port') != self.circuit.socks_port:
+            self.options.set_preference('network.proxy.socks_port', self.circuit.socks_port)
+            if self.driver:
+                # Firefox cannot switch proxies while running; the next browser page starts a new one
+                logging.info(f"Moving browser session to SOCKS port {self.circuit.socks_port}")
+                try:
+                    self.driver.quit()
+                except Exception:
+                    pass
+                self.driver = None
+
+    def fetch_http(self, url, retries=3):
+        for attempt in range(retries):
+            self.sync_circuit()
+            start = time.monotonic()
+            try:
+                with span('fetch_http'):
+                    html = self.http.fetch(url)
+                self.transport.report(self.circuit, time.monotonic() - start, True)
+                return html
+            except requests.RequestException as e:
+                logging.warning(f"HTTP error on {url}: {e}")
+                if isinstance(e, requests.HTTPError):
+                    # The circuit delivered a response; the page itself is the problem
+                    self.transport.report(self.circuit, time.monotonic() - start, True)
+                    if e.response is not None and e.response.status_code < 500:
+                        return None
+                else:
+                    self.transport.report(self.circuit, time.monotonic() - start, False)
+                if attempt + 1 < retries:
+                    FETCH_RETRIES.inc(tier='http')
+                    with span('backoff'):
+                        time.sleep(2 ** attempt)
+        return None
+
+    def fetch_browser(self, url, retries=3):
+        self.sync_circuit()
+        driver = self.get_driver()
+        if not driver:
             logging.error("Webdriver not initialized.")
             return None
 
+        host = urlparse(url).netloc
         for attempt in range(retries):
+            timeout = self.timings.timeout(host)
+            start = time.monotonic()
             try:
-                self.driver.get(url)
-                time.sleep(5)  # wait for JS to load
-                html = self.driver.page_source
-                return html
-            except (TimeoutException, WebDriverException) as e:
+                driver.set_page_load_timeout(timeout)
+                with span('fetch_browser'):
+                    driver.get(url)
+                with span('page_ready'):
+                    ready = self.wait_until_ready(driver, start + timeout)
+                if not ready:
+                    logging.info(f"{url} still busy after {timeout:.1f}s, using current render")
+                elapsed = time.monotonic() - start
+                self.timings.observe(host, elapsed)
+                self.transport.report(self.circuit, elapsed, True)
+                html = driver.page_source
+                # Screenshots come from the render that is already loaded, and only if the caller wants one
+                capture = self.capture_current if self.screenshots else None
+                return self.make_page(url, html, via='browser', final_url=driver.current_url,
+                                      title=driver.title, capture=capture)
+            except TimeoutException as e:
+                logging.warning(f"Timed out loading {url} after {timeout:.1f}s: {e}")
+                self.timings.observe(host, timeout)
+                self.transport.report(self.circuit, timeout, False)
+                if attempt + 1 < retries:
+                    FETCH_RETRIES.inc(tier='browser')
+            except WebDriverException as e:
                 logging.warning(f"Selenium error on {url}: {e}")
-                time.sleep(2 ** attempt)
+                if not self.is_healthy():
+                    self.restart_driver()
+                    raise DriverCrashed(url) from e
+                self.transport.report(self.circuit, time.monotonic() - start, False)
+                if attempt + 1 < retries:
+                    FETCH_RETRIES.inc(tier='browser')
+                    with span('backoff'):
+                        time.sleep(2 ** attempt)
         return None
 
-    def capture_screenshot(self, url, save_path):
-        if not self.driver:
-            logging.error("Webdriver not initialized for screenshot.")
-            return False
+    def render_and_capture(self, page):
+        """Load a page fetched over HTTP in Firefox, adopt that render and screenshot it."""
+        self.sync_circuit()
+        driver = self.get_driver()
+        if not driver:
+            return None
+        url = page['url']
+        host = urlparse(url).netloc
+        timeout = self.timings.timeout(host)
+        start = time.monotonic()
         try:
-            self.driver.get(url)
-            time.sleep(5)  # wait for page to load
-            self.driver.save_screenshot(save_path)
-            logging.info(f"Screenshot saved to {save_path}")
-            return True
-        except Exception as e:
-            logging.error(f"Screenshot error for {url}: {e}")
-            return False
+            driver.set_page_load_timeout(timeout)
+            with span('fetch_browser'):
+                driver.get(url)
+            with span('page_ready'):
+                self.wait_until_ready(driver, start + timeout)
+            self.timings.observe(host, time.monotonic() - start)
+        except TimeoutException:
+            logging.info(f"Timed out rendering {url} for a screenshot, using current render")
+            self.timings.observe(host, timeout)
+        except WebDriverException as e:
+            logging.error(f"Screenshot error on {url}: {e}")
+            if not self.is_healthy():
+                self.restart_driver()
+            return None
+        try:
+            page.update(html=driver.page_source, final_url=driver.current_url, title=driver.title, via='browser')
+        except WebDriverException as e:
+            logging.error(f"Could not read the render of {url}: {e}")
+            return None
+        with span('parse'):
+            page['parsed'] = parse_page(page['html'], page['final_url'])
+        return self.capture_current()
+
+    def capture_current(self):
+        try:
+            with span('screenshot'):
+                return self.driver.get_screenshot_as_base64()
+        except WebDriverException as e:
+            logging.error(f"Screenshot error: {e}")
+            return None
 
-    def extract_links(self, html, base_url):
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html, 'html.parser')
+    def extract_links(self, hrefs):
         links = set()
-        for tag in soup.find_all('a', href=True):
-            abs_url = urljoin(base_url, tag['href'])
+        for abs_url in hrefs:
             if is_valid_onion_url(abs_url):
                 normalized = normalize_url(abs_url.split('?')[0].split('#')[0])
                 links.add(normalized)
         return links
 
-    def crawl(self, url, depth, callback):
-        normalized_url = normalize_url(url)
-        if depth > MAX_DEPTH or len(CRAWLED_URLS) >= CRAWL_LIMIT or normalized_url in CRAWLED_URLS:
-            return
-        CRAWLED_URLS.add(normalized_url)
-        logging.info(f"Crawling {normalized_url} at depth {depth}")
-        html = self.fetch_page(normalized_url)
-        if not html:
-            logging.warning(f"Failed to fetch {normalized_url}")
-            return
-        callback(normalized_url, html)
-        time.sleep(3)  # polite delay
-        for link in self.extract_links(html, normalized_url):
-            if len(CRAWLED_URLS) >= CRAWL_LIMIT:
-                break
-            self.crawl(link, depth + 1, callback)
-
     def close(self):
+        self.transport.release(self.circuit)
+        self.http.close()
         if self.driver:
-            self.driver.quit()
\ No newline at end of file
+            self.driver.quit()
+
+class CrawlScheduler:
+    """Breadth-first frontier shared by a pool of TorCrawler sessions.
+
+    Each worker thread owns one session. Politeness is enforced per onion
+    host: a host is fetched by at most one worker at a time and not again
+    until POLITENESS_DELAY seconds after its previous page finished, so
+    pages on different hidden services are fetched concurrently.
+
+    Queued and visited URLs live in a CrawlState on disk; only a window of
+    up to FRONTIER_BUFFER of the best pending URLs is held in memory, as a
+    heap on priority. Discovered links pass through a LinkPrioritizer,
+    which drops crawler traps and scores the rest. CRAWL_LIMIT caps the
+    pages fetched, not the URLs queued, so a good link found late still
+    beats low-value ones queued earlier.
+    """
+
+    def __init__(self, workers=CRAWL_WORKERS, politeness_delay=POLITENESS_DELAY, session_factory=TorCrawler,
+                 state=None):
+        self.workers = max(1, workers)
+        self.politeness_delay = politeness_delay
+        self.session_factory = session_factory
+        self.state = state if state is not None else CrawlState()
+        self.prioritizer = LinkPrioritizer()
+        self.prioritizer.seed(self.state.pattern_counts())
+        self.frontier = []  # heap of (priority, seq, url, depth)
+        self.busy_hosts = set()
+        self.host_ready_at = {}
+        self.in_flight = 0
+        self.crash_requeues = {}
+        self.cond = threading.Condition()
+
+    def crawl(self, start_url, callback, depth=0):
+        # start_url may be None when resuming from a saved frontier
+        if start_url:
+            with self.cond:
+                self._enqueue(normalize_url(start_url), depth)
+                self.state.commit()
+        threads = [threading.Thread(target=self._worker, args=(callback,), name=f"crawler-{i}", daemon=True)
+                   for i in range(self.workers)]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                t.join()
+        finally:
+            # Also reached on Ctrl-C: in-flight URLs stay leased and are retried on --resume
+            with self.cond:
+                self.state.checkpoint()
+
+    def _enqueue(self, url, depth):
+        # Caller must hold self.cond.
+        if depth > MAX_DEPTH or url in self.state:
+            return False
+        admitted = self.prioritizer.admit(url, depth)
+        if admitted is None:
+            logging.debug(f"Skipping {url}: pattern or host cap reached")
+            return False
+        priority, pattern = admitted
+        if not self.state.add(url, depth, priority, pattern):
+            return False
+        self.cond.notify_all()
+        return True
+
+    def _next_task(self):
+        """Return the best (priority, seq, url, depth) entry whose host may be fetched now, or None when done."""
+        with self.cond:
+            while True:
+                if self.state.done_count + self.in_flight >= CRAWL_LIMIT:
+                    # In-flight pages may still be re-queued, so only stop once they have finished
+                    if self.in_flight == 0:
+                        self.cond.notify_all()
+                        return None
+                    self.cond.wait()
+                    continue
+                if len(self.frontier) < FRONTIER_BUFFER // 2:
+                    for entry in self.state.lease(FRONTIER_BUFFER - len(self.frontier)):
+                        heapq.heappush(self.frontier, entry)
+                if not self.frontier and self.in_flight == 0:
+                    self.cond.notify_all()
+                    return None
+                now = time.monotonic()
+                wait = None
+                task = None
+                skipped = []
+                while self.frontier:
+                    entry = heapq.heappop(self.frontier)
+                    host = urlparse(entry[2]).netloc
+                    if host not in self.busy_hosts:
+                        ready_at = self.host_ready_at.get(host, 0)
+                        if ready_at <= now:
+                            task = entry
+                            break
+                        wait = ready_at - now if wait is None else min(wait, ready_at - now)
+                    skipped.append(entry)
+                for entry in skipped:
+                    heapq.heappush(self.frontier, entry)
+                if task:
+                    self.busy_hosts.add(host)
+                    self.in_flight += 1
+                    self._update_gauges()
+                    return task
+                self.cond.wait(wait)
+
+    def _task_done(self, task, links, requeue=False):
+        _, _, url, depth = task
+        host = urlparse(url).netloc
+        with self.cond:
+            self.busy_hosts.discard(host)
+            self.host_ready_at[host] = time.monotonic() + self.politeness_delay
+            self.in_flight -= 1
+            if requeue:
+                # Still leased in the crawl state, so put it back directly
+                heapq.heappush(self.frontier, task)
+            else:
+                self.state.done(url)
+            for link in links:
+                self._enqueue(link, depth + 1)
+            # Commit with every page so a restart neither refetches it nor loses its links
+            self.state.commit()
+            self.state.maybe_checkpoint()
+            self._update_gauges()
+            self.cond.notify_all()
+
+    def _update_gauges(self):
+        # Caller must hold self.cond.
+        FRONTIER_URLS.set(len(self.frontier) + self.state.pending)
+        IN_FLIGHT.set(self.in_flight)
+
+    def _worker(self, callback):
+        session = self.session_factory()
+        try:
+            while True:
+                # Time spent here is politeness delay or an empty frontier
+                with span('queue_wait'):
+                    task = self._next_task()
+                if task is None:
+                    break
+                _, _, url, depth = task
+                links = ()
+                requeue = False
+                try:
+                    logging.info(f"Crawling {url} at depth {depth}")
+                    page = session.fetch_page(url)
+                    if page:
+                        # Parsed once here; the callback reuses it for analysis.
+                        # A callback returning False (e.g. for a duplicate page) stops link expansion.
+                        with span('parse'):
+                            page['parsed'] = parse_page(page['html'], page['final_url'])
+                        with span('handle_page'):
+                            follow = callback(url, page)
+                        if follow is not False:
+                            links = session.extract_links(page['parsed']['links'])
+                    else:
+                        PAGES.inc(outcome='failed')
+                        logging.warning(f"Failed to fetch {url}")
+                except DriverCrashed:
+                    with self.cond:
+                        attempts = self.crash_requeues.get(url, 0)
+                        requeue = attempts < DRIVER_CRASH_REQUEUES
+                        self.crash_requeues[url] = attempts + 1
+                    if requeue:
+                        logging.warning(f"Browser session crashed on {url}, re-queued")
+                    else:
+                        logging.error(f"Browser session crashed on {url} again, giving up")
+                except Exception as e:
+                    PAGES.inc(outcome='error')
+                    logging.error(f"Error while crawling {url}: {e}")
+                finally:
+                    self._task_done(task, links, requeue)
+        finally:
+            session.close()
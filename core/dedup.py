@@ -0,0 +1,82 @@
+import hashlib
+import re
+import threading
+from config import SIMHASH_DISTANCE, DEDUP_MIN_TOKENS
+
+SIMHASH_BITS = 64
+SHINGLE_SIZE = 3
+TOKEN_RE = re.compile(r'\w+')
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+def content_hash(tokens):
+    return hashlib.sha256(' '.join(tokens).encode('utf-8')).hexdigest()
+
+def simhash(tokens):
+    if len(tokens) < SHINGLE_SIZE:
+        shingles = [' '.join(tokens)]
+    else:
+        shingles = [' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = _hash64(shingle)
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+    return sum(1 << bit for bit in range(SIMHASH_BITS) if weights[bit] > 0)
+
+def fingerprint(text):
+    """Return (sha256 of normalized tokens, 64-bit SimHash), or None for near-empty text."""
+    tokens = tokenize(text)
+    if len(tokens) < DEDUP_MIN_TOKENS:
+        return None
+    return content_hash(tokens), simhash(tokens)
+
+class DuplicateIndex:
+    """Exact and near-duplicate lookup over page fingerprints.
+
+    SimHashes are split into max_distance + 1 bands; by the pigeonhole
+    principle two hashes within max_distance bits agree on at least one
+    whole band, so only pages sharing a band value are compared.
+    """
+
+    def __init__(self, max_distance=SIMHASH_DISTANCE):
+        self.max_distance = max_distance
+        self.bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.bands
+        self.exact = {}
+        self.tables = [{} for _ in range(self.bands)]
+        self.lock = threading.Lock()
+
+    def _band_keys(self, value):
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (i * self.band_bits)) & mask for i in range(self.bands)]
+
+    def find(self, digest, value):
+        canonical = self.exact.get(digest)
+        if canonical:
+            return canonical
+        for table, key in zip(self.tables, self._band_keys(value)):
+            for other, url in table.get(key, ()):
+                if bin(value ^ other).count('1') <= self.max_distance:
+                    return url
+        return None
+
+    def add(self, url, digest, value):
+        self.exact.setdefault(digest, url)
+        for table, key in zip(self.tables, self._band_keys(value)):
+            table.setdefault(key, []).append((value, url))
+
+    def check(self, url, digest, value):
+        """Return the canonical URL if this page duplicates a known one, else register it and return None."""
+        with self.lock:
+            canonical = self.find(digest, value)
+            if canonical is None:
+                self.add(url, digest, value)
+            elif canonical == url:
+                # The same URL fetched again, e.g. after resuming a crawl: not a duplicate of itself
+                return None
+            return canonical
@@ -0,0 +1,175 @@
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+import struct
+import time
+from config import CRAWL_STATE_DB, CHECKPOINT_INTERVAL, BLOOM_CAPACITY, BLOOM_ERROR_RATE
+
+PENDING, LEASED, DONE = 0, 1, 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    status INTEGER NOT NULL DEFAULT 0,
+    seq INTEGER NOT NULL,
+    priority REAL NOT NULL DEFAULT 0,
+    pattern TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_urls_status_priority ON urls(status, priority, seq);
+CREATE INDEX IF NOT EXISTS idx_urls_pattern ON urls(pattern);
+"""
+
+# size, hashes, and the seq up to which every queued URL is in the filter
+BLOOM_HEADER = struct.Struct('<QIQ')
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over a blake2b digest."""
+
+    def __init__(self, capacity=BLOOM_CAPACITY, error_rate=BLOOM_ERROR_RATE, size=None, hashes=None):
+        self.size = size or max(8, int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)))
+        self.hashes = hashes or max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+    def save(self, path, seq=0):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(self.size, self.hashes, seq))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Return (filter, seq) as written by save()."""
+        with open(path, 'rb') as f:
+            size, hashes, seq = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+            bloom = cls(size=size, hashes=hashes)
+            bits = f.read()
+        if len(bits) != len(bloom.bits):
+            raise ValueError(f"Truncated bloom filter in {path}")
+        bloom.bits[:] = bits
+        return bloom, seq
+
+class CrawlState:
+    """On-disk crawl frontier and visited set.
+
+    Every URL ever queued lives in SQLite with its depth and status; the
+    Bloom filter answers "never seen" without touching disk and SQLite
+    confirms the positives, so RAM stays bounded however large the crawl
+    gets. The scheduler commits after every page, so a finished URL and
+    the links it queued become durable together with its result; the
+    filter is only saved at checkpoints and topped up from SQLite on
+    resume. On resume, URLs that were leased to workers go back to pending.
+
+    Not thread-safe: the scheduler calls it while holding its own lock.
+    """
+
+    def __init__(self, path=CRAWL_STATE_DB, resume=False, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.path = path
+        self.bloom_path = path + '.bloom'
+        self.checkpoint_interval = checkpoint_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not resume:
+            for stale in (path, path + '-wal', path + '-shm', self.bloom_path):
+                if os.path.exists(stale):
+                    os.remove(stale)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.execute("UPDATE urls SET status = ? WHERE status = ?", (PENDING, LEASED))
+        self.count, max_seq = self.conn.execute("SELECT COUNT(*), COALESCE(MAX(seq), 0) FROM urls").fetchone()
+        self.pending = self.conn.execute("SELECT COUNT(*) FROM urls WHERE status = ?", (PENDING,)).fetchone()[0]
+        self.done_count = self.conn.execute("SELECT COUNT(*) FROM urls WHERE status = ?", (DONE,)).fetchone()[0]
+        self.next_seq = max_seq + 1
+        self.bloom = self._load_bloom() if resume else BloomFilter()
+        self.conn.commit()
+        self.last_checkpoint = time.monotonic()
+        if resume:
+            logging.info(f"Resuming crawl: {self.count} URLs seen, {self.pending} pending")
+
+    def _load_bloom(self):
+        try:
+            bloom, seq = BloomFilter.load(self.bloom_path)
+        except (OSError, ValueError, struct.error):
+            # Missing or torn filter: rebuild it from the exact store
+            bloom, seq = BloomFilter(), 0
+        # URLs committed after the filter was last saved
+        for (url,) in self.conn.execute("SELECT url FROM urls WHERE seq >= ?", (seq,)):
+            bloom.add(url)
+        return bloom
+
+    def __contains__(self, url):
+        if url not in self.bloom:
+            return False
+        return self.conn.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def add(self, url, depth, priority=0, pattern=None):
+        if url in self:
+            return False
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO urls (url, depth, status, seq, priority, pattern) VALUES (?, ?, ?, ?, ?, ?)",
+            (url, depth, PENDING, self.next_seq, priority, pattern),
+        )
+        self.bloom.add(url)
+        if cursor.rowcount == 0:
+            return False
+        self.next_seq += 1
+        self.count += 1
+        self.pending += 1
+        return True
+
+    def lease(self, limit):
+        """Mark up to limit of the best pending URLs as leased; return (priority, seq, url, depth) rows."""
+        if not self.pending:
+            return []
+        rows = self.conn.execute(
+            "SELECT priority, seq, url, depth FROM urls WHERE status = ? ORDER BY priority, seq LIMIT ?",
+            (PENDING, limit),
+        ).fetchall()
+        self.conn.executemany("UPDATE urls SET status = ? WHERE url = ?", [(LEASED, row[2]) for row in rows])
+        self.pending -= len(rows)
+        return rows
+
+    def pattern_counts(self):
+        return self.conn.execute(
+            "SELECT pattern, COUNT(*) FROM urls WHERE pattern IS NOT NULL GROUP BY pattern"
+        ).fetchall()
+
+    def done(self, url):
+        self.conn.execute("UPDATE urls SET status = ? WHERE url = ?", (DONE, url))
+        self.done_count += 1
+
+    def commit(self):
+        self.conn.commit()
+
+    def maybe_checkpoint(self):
+        if time.monotonic() - self.last_checkpoint >= self.checkpoint_interval:
+            self.checkpoint()
+
+    def checkpoint(self):
+        self.conn.commit()
+        self.bloom.save(self.bloom_path, self.next_seq)
+        self.last_checkpoint = time.monotonic()
+
+    def close(self):
+        self.checkpoint()
+        self.conn.close()
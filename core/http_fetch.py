@@ -0,0 +1,62 @@
+import re
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+from config import TOR_PROXY, HTTP_TIMEOUT, HTTP_POOL_SIZE
+from core.utils import get_random_user_agent
+
+SCRIPT_OR_STYLE_RE = re.compile(r'<(script|style|noscript)\b.*?</\1\s*>', re.I | re.S)
+TAG_RE = re.compile(r'<[^>]+>')
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.I)
+JS_APP_MARKERS = ('id="root"', 'id="app"', 'id="__next"', 'ng-app', 'data-reactroot', 'data-server-rendered')
+JS_REQUIRED_HINTS = ('enable javascript', 'javascript is required', 'requires javascript', 'javascript must be enabled')
+MIN_STATIC_TEXT = 200
+
+def visible_text_length(html):
+    text = TAG_RE.sub(' ', SCRIPT_OR_STYLE_RE.sub(' ', html))
+    return len(' '.join(text.split()))
+
+def looks_js_rendered(html):
+    lowered = html.lower()
+    if '<noscript' in lowered and any(hint in lowered for hint in JS_REQUIRED_HINTS):
+        return True
+    text_length = visible_text_length(html)
+    if '<script' in lowered and text_length < MIN_STATIC_TEXT:
+        return True
+    return any(marker in lowered for marker in JS_APP_MARKERS) and text_length < 5 * MIN_STATIC_TEXT
+
+class HttpFetcher:
+    """Keep-alive HTTP client routed through the Tor SOCKS proxy.
+
+    Each crawler session owns one fetcher, so the connection pool is reused
+    across pages of the same hidden service without sharing a
+    requests.Session between threads.
+    """
+
+    def __init__(self, proxies=TOR_PROXY, timeout=HTTP_TIMEOUT, pool_size=HTTP_POOL_SIZE):
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.proxies.update(proxies)
+        self.session.headers.update({
+            'User-Agent': get_random_user_agent(),
+            'Accept': 'text/html,application/xhtml+xml;q=0.9,*/*;q=0.8',
+        })
+
+    def fetch(self, url):
+        response = self.session.get(url, timeout=self.timeout)
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'text/html')
+        if 'html' not in content_type and 'text' not in content_type:
+            logging.info(f"Skipping non-HTML content at {url} ({content_type})")
+            return None
+        if 'charset' not in content_type.lower():
+            # requests assumes ISO-8859-1 for text/* without a charset; honour <meta charset> instead
+            match = META_CHARSET_RE.search(response.content[:4096])
+            response.encoding = match.group(1).decode('ascii') if match else response.apparent_encoding
+        return response.text
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,67 @@
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+from config import MAX_URLS_PER_PATTERN, MAX_URLS_PER_TOKEN_PATTERN, MAX_URLS_PER_HOST
+from core.utils import url_pattern
+
+RANDOM_MASKS = ('{token}', '{hex}', '{uuid}')
+SKIP_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg', '.ico', '.bmp',
+    '.css', '.js', '.woff', '.woff2', '.ttf',
+    '.zip', '.rar', '.7z', '.gz', '.tar', '.exe', '.apk', '.iso',
+    '.pdf', '.mp3', '.mp4', '.avi', '.mkv', '.webm',
+}
+LOW_VALUE_SEGMENTS = {'login', 'logout', 'signin', 'signup', 'register', 'cart', 'checkout', 'captcha', 'lang'}
+
+class LinkPrioritizer:
+    """Decides which discovered links enter the frontier, and in what order.
+
+    Links are grouped by url_pattern, which masks ids, dates and random
+    tokens in the path. Each pattern and each host may only expand a
+    limited number of URLs, so ad-click redirectors, session ids in paths
+    and calendars cannot use up the crawl limit. Admitted links get a
+    priority (lower is fetched first) that favours shallow, novel,
+    content-bearing pages over further instances of a known template.
+    """
+
+    def __init__(self, max_per_pattern=MAX_URLS_PER_PATTERN, max_per_token_pattern=MAX_URLS_PER_TOKEN_PATTERN,
+                 max_per_host=MAX_URLS_PER_HOST):
+        self.max_per_pattern = max_per_pattern
+        self.max_per_token_pattern = max_per_token_pattern
+        self.max_per_host = max_per_host
+        self.pattern_counts = Counter()
+        self.host_counts = Counter()
+        self.lock = threading.Lock()
+
+    def seed(self, pattern_counts):
+        """Restore counts from a resumed crawl: an iterable of (pattern, count)."""
+        with self.lock:
+            for pattern, count in pattern_counts:
+                self.pattern_counts[pattern] += count
+                self.host_counts[pattern.split('/', 1)[0]] += count
+
+    def admit(self, url, depth):
+        """Return (priority, pattern) if url should be queued, else None."""
+        path = urlparse(url).path
+        if os.path.splitext(path)[1].lower() in SKIP_EXTENSIONS:
+            return None
+        pattern = url_pattern(url)
+        host, _, masked_path = pattern.partition('/')
+        random_masks = sum(masked_path.count(mask) for mask in RANDOM_MASKS)
+        limit = self.max_per_token_pattern if random_masks else self.max_per_pattern
+        with self.lock:
+            seen_pattern = self.pattern_counts[pattern]
+            seen_host = self.host_counts[host]
+            if seen_pattern >= limit or seen_host >= self.max_per_host:
+                return None
+            self.pattern_counts[pattern] += 1
+            self.host_counts[host] += 1
+
+        segments = masked_path.lower().split('/')
+        priority = depth
+        priority += 0.2 * seen_pattern
+        priority += 0.5 * random_masks
+        priority += 1.0 if LOW_VALUE_SEGMENTS.intersection(segments) else 0.0
+        priority += seen_host / self.max_per_host
+        return priority, pattern
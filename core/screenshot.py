@@ -1,13 +1,18 @@
 from selenium import webdriver
 from selenium.webdriver.firefox.options import Options
+import base64
 import logging
+import queue
+import threading
+from config import TOR_HOST, TOR_SOCKS_PORTS
+from core.metrics import span
 
-def capture_screenshot(url, save_path):
+def capture_screenshot(url, save_path, socks_port=TOR_SOCKS_PORTS[0]):
     options = Options()
     options.headless = True
     options.set_preference('network.proxy.type', 1)
-    options.set_preference('network.proxy.socks', '127.0.0.1')
-    options.set_preference('network.proxy.socks_port', 9050)
+    options.set_preference('network.proxy.socks', TOR_HOST)
+    options.set_preference('network.proxy.socks_port', socks_port)
     options.set_preference("network.proxy.socks_remote_dns", True)
 
     try:
@@ -25,3 +30,37 @@ def capture_screenshot(url, save_path):
         logging.error(f"Screenshot error for {url}: {e}")
     finally:
         driver.quit()
+
+class ScreenshotWriter:
+    """Decodes and writes screenshots on a background thread.
+
+    Crawler workers hand over the base64 PNG returned by the driver and
+    move on to the next URL; the disk write happens here.
+    """
+
+    def __init__(self):
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, save_path, png_base64):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+                self.thread.start()
+        self.queue.put((save_path, png_base64))
+
+    def _run(self):
+        while True:
+            save_path, png_base64 = self.queue.get()
+            try:
+                with span('screenshot_write'), open(save_path, 'wb') as f:
+                    f.write(base64.b64decode(png_base64))
+                logging.info(f"Screenshot saved to {save_path}")
+            except Exception as e:
+                logging.error(f"Failed to write screenshot {save_path}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def flush(self):
+        self.queue.join()
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+from config import RESULTS_DB
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    blacklisted INTEGER NOT NULL DEFAULT 0,
+    content_hash TEXT,
+    simhash TEXT,
+    duplicate_of TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_url ON results(url);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+CREATE INDEX IF NOT EXISTS idx_results_blacklisted ON results(blacklisted, id);
+CREATE INDEX IF NOT EXISTS idx_results_duplicate_of ON results(duplicate_of);
+CREATE TABLE IF NOT EXISTS result_keywords (
+    keyword TEXT NOT NULL,
+    result_id INTEGER NOT NULL,
+    count INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (keyword, result_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_result_keywords_result ON result_keywords(result_id);
+"""
+
+MAX_PAGE_SIZE = 500
+
+class ResultStore:
+    """Crawl results in a SQLite database running in WAL mode.
+
+    The crawler appends while the dashboard reads; WAL lets both proceed
+    without blocking each other. Connections are per thread because
+    sqlite3 connections must not be shared across threads.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self.connect()
+        conn.executescript(SCHEMA)
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def add(self, result):
+        conn = self.connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO results (url, timestamp, title, blacklisted, content_hash, simhash, duplicate_of, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (result['url'], result['timestamp'], result.get('metadata', {}).get('title') or '',
+                 int(bool(result.get('blacklisted'))), result.get('content_hash'), result.get('simhash'),
+                 result.get('duplicate_of'), json.dumps(result)),
+            )
+            result_id = cursor.lastrowid
+            counts = result.get('keyword_counts') or {kw: 1 for kw in result.get('keywords_found', [])}
+            conn.executemany(
+                "INSERT OR REPLACE INTO result_keywords (keyword, result_id, count) VALUES (?, ?, ?)",
+                [(kw, result_id, count) for kw, count in counts.items()],
+            )
+        return result_id
+
+    def _filters(self, keyword=None, blacklisted=None, url=None, duplicates=True):
+        clauses, params = [], []
+        if not duplicates:
+            clauses.append("duplicate_of IS NULL")
+        if keyword:
+            clauses.append("id IN (SELECT result_id FROM result_keywords WHERE keyword = ?)")
+            params.append(keyword)
+        if blacklisted is not None:
+            clauses.append("blacklisted = ?")
+            params.append(int(bool(blacklisted)))
+        if url:
+            clauses.append("url LIKE ?")
+            params.append(f"%{url}%")
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return where, params
+
+    def query(self, page=1, per_page=50, keyword=None, blacklisted=None, url=None, duplicates=True):
+        """Return (rows, total) for one page of results, newest first."""
+        page = max(1, page)
+        per_page = min(max(1, per_page), MAX_PAGE_SIZE)
+        where, params = self._filters(keyword, blacklisted, url, duplicates)
+        conn = self.connect()
+        total = conn.execute(f"SELECT COUNT(*) FROM results{where}", params).fetchone()[0]
+        rows = conn.execute(
+            f"SELECT id, data FROM results{where} ORDER BY id DESC LIMIT ? OFFSET ?",
+            params + [per_page, (page - 1) * per_page],
+        ).fetchall()
+        return [self._row(row) for row in rows], total
+
+    def since(self, last_id, limit=100):
+        """Return results added after last_id, oldest first."""
+        rows = self.connect().execute(
+            "SELECT id, data FROM results WHERE id > ? ORDER BY id LIMIT ?", (last_id, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def fingerprints(self):
+        """Yield (url, content_hash, simhash) of every canonical page, to rebuild the duplicate index."""
+        yield from self.connect().execute(
+            "SELECT url, content_hash, simhash FROM results WHERE content_hash IS NOT NULL AND duplicate_of IS NULL"
+        )
+
+    def latest_id(self):
+        return self.connect().execute("SELECT COALESCE(MAX(id), 0) FROM results").fetchone()[0]
+
+    def clear(self):
+        conn = self.connect()
+        with conn:
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM result_keywords")
+
+    def _row(self, row):
+        entry = json.loads(row['data'])
+        entry['id'] = row['id']
+        entry['active'] = bool(entry.get('keywords_found') or entry.get('metadata', {}).get('title'))
+        entry['screenshot_filename'] = os.path.basename(entry.get('screenshot', ''))
+        return entry
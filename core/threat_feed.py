@@ -1,17 +1,144 @@
-from urllib.parse import urlparse
+import csv
+import json
 import logging
+import os
+import threading
+import time
+from urllib.parse import urlparse
+from config import THREAT_FEEDS, FEED_CHECK_INTERVAL
+
+def _normalize_domain(value):
+    value = value.strip().lower()
+    if '://' in value:
+        value = urlparse(value).netloc
+    return value.split(':')[0].strip('.')
+
+def _reversed_key(domain):
+    # 'shop.market.onion' -> 'onion.market.shop', the order lookups walk the host labels in
+    return '.'.join(reversed(domain.split('.')))
+
+def _parse_text(f):
+    for line in f:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield line, None, None
+
+def _parse_csv(f):
+    for row in csv.reader(line for line in f if not line.lstrip().startswith('#')):
+        if not row or not row[0].strip() or row[0].strip().lower() in ('domain', 'url', 'host'):
+            continue
+        tag = row[1].strip() if len(row) > 1 and row[1].strip() else None
+        severity = row[2].strip() if len(row) > 2 and row[2].strip() else None
+        yield row[0], tag, severity
+
+def _parse_json(f):
+    data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('domains') or data.get('entries') or []
+    for entry in data:
+        if isinstance(entry, str):
+            yield entry, None, None
+        elif isinstance(entry, dict):
+            domain = entry.get('domain') or entry.get('url') or entry.get('host')
+            if domain:
+                yield domain, entry.get('tag'), entry.get('severity')
+
+PARSERS = {'.csv': _parse_csv, '.json': _parse_json}
+
+class BlacklistIndex:
+    """Suffix index over one or more blacklist feeds.
+
+    Every feed is loaded once into a dict keyed by its reversed domain
+    labels. A lookup walks the labels of the URL's host from the TLD
+    inwards, so it costs O(label count) regardless of feed size. Feeds are
+    reloaded only when their mtime changes, checked at most once every
+    FEED_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self, feed_paths=THREAT_FEEDS, check_interval=FEED_CHECK_INTERVAL):
+        self.feed_paths = list(feed_paths)
+        self.check_interval = check_interval
+        self.feeds = {}
+        self.mtimes = {}
+        self.last_check = None
+        self.lock = threading.Lock()
+
+    def load_feed(self, path):
+        parser = PARSERS.get(os.path.splitext(path)[1].lower(), _parse_text)
+        entries = {}
+        with open(path, 'r', encoding='utf-8') as f:
+            for raw_domain, tag, severity in parser(f):
+                domain = _normalize_domain(raw_domain)
+                if domain:
+                    entries[_reversed_key(domain)] = (tag, severity)
+        logging.info(f"Loaded {len(entries)} blacklist entries from {path}")
+        return entries
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.last_check is not None and now - self.last_check < self.check_interval:
+            return
+        with self.lock:
+            if not force and self.last_check is not None and now - self.last_check < self.check_interval:
+                return
+            self.last_check = now
+            for path in self.feed_paths:
+                try:
+                    mtime = os.stat(path).st_mtime
+                except OSError as e:
+                    if path in self.feeds or path not in self.mtimes:
+                        logging.error(f"Error reading blacklist feed {path}: {e}")
+                    self.feeds.pop(path, None)
+                    self.mtimes[path] = None
+                    continue
+                if self.mtimes.get(path) == mtime and path in self.feeds:
+                    continue
+                try:
+                    # Swap in the new dict whole so concurrent lookups never see a partial feed
+                    self.feeds[path] = self.load_feed(path)
+                    self.mtimes[path] = mtime
+                except (OSError, ValueError) as e:
+                    logging.error(f"Error reading blacklist feed {path}: {e}")
+
+    def lookup(self, url):
+        """Return a list of hits ({'feed', 'domain', 'tag', 'severity'}) for url's host."""
+        self.refresh()
+        host = _normalize_domain(urlparse(url).netloc)
+        if not host:
+            return []
+        labels = host.split('.')
+        hits = []
+        for path, entries in list(self.feeds.items()):
+            key = ''
+            for i in range(len(labels) - 1, -1, -1):
+                key = labels[i] if not key else key + '.' + labels[i]
+                entry = entries.get(key)
+                if entry is not None:
+                    hits.append({
+                        'feed': path,
+                        'domain': '.'.join(labels[i:]),
+                        'tag': entry[0],
+                        'severity': entry[1],
+                    })
+        return hits
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+def get_index(feed_paths=THREAT_FEEDS):
+    key = tuple(feed_paths)
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if index is None:
+            index = _INDEXES[key] = BlacklistIndex(key)
+    return index
+
+def match_blacklist(url, feed_paths=THREAT_FEEDS):
+    hits = get_index(feed_paths).lookup(url)
+    for hit in hits:
+        logging.info(f"URL {url} is blacklisted due to domain {hit['domain']} ({hit['feed']})")
+    return hits
 
-def check_blacklist(url, feed_path="tools/feeds.txt"):
-    try:
-        parsed = urlparse(url)
-        domain = parsed.netloc.lower()
-        with open(feed_path, 'r') as f:
-            bad_domains = set(line.strip().lower() for line in f if line.strip())
-        for bad_domain in bad_domains:
-            if domain == bad_domain or domain.endswith('.' + bad_domain):
-                logging.info(f"URL {url} is blacklisted due to domain {bad_domain}")
-                return True
-        return False
-    except Exception as e:
-        logging.error(f"Error reading blacklist feed: {e}")
-        return False
+def check_blacklist(url, feed_path=None):
+    feed_paths = [feed_path] if feed_path else THREAT_FEEDS
+    return bool(match_blacklist(url, feed_paths))
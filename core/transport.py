@@ -0,0 +1,172 @@
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from stem import Signal
+from stem.control import Controller
+from config import (TOR_HOST, TOR_SOCKS_PORTS, TOR_CONTROL_PORT, TOR_CONTROL_PASSWORD, TOR_STREAM_ISOLATION,
+                    CIRCUIT_MAX_ERROR_RATE, CIRCUIT_MAX_LATENCY, NEWNYM_INTERVAL)
+from core.metrics import CIRCUIT_RENEWALS
+
+ERROR_WINDOW = 20
+MIN_SAMPLES = 5
+LATENCY_ALPHA = 0.3
+
+class Health:
+    """Smoothed latency and recent error rate of requests over one path."""
+
+    def reset_health(self):
+        self.latency = None
+        self.outcomes = deque(maxlen=ERROR_WINDOW)
+
+    def observe(self, seconds, ok):
+        self.outcomes.append(ok)
+        if ok:
+            self.latency = seconds if self.latency is None else self.latency + LATENCY_ALPHA * (seconds - self.latency)
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+class SocksPort(Health):
+    """One Tor SOCKS port, with the load and health used to choose it for new sessions."""
+
+    def __init__(self, host, socks_port):
+        self.host = host
+        self.socks_port = socks_port
+        self.leases = 0
+        self.renewals = 0
+        self.reset_health()
+
+    def score(self, failure_cost):
+        # Lower is better: unmeasured ports are tried first, then the fastest and least shared.
+        # Failures add failure_cost seconds each, so a port that only fails never scores as free.
+        latency = self.latency if self.latency is not None else 0.0
+        return (latency * (1 + 4 * self.error_rate) + failure_cost * self.error_rate, self.leases)
+
+class Circuit(Health):
+    """One session's lease on a SOCKS port, with its own isolation credentials.
+
+    Tor isolates streams by SOCKS username/password (IsolateSOCKSAuth is on
+    by default), so every lease gets its own circuit and rotating the
+    credentials moves that session's HTTP traffic onto a fresh one.
+    Firefox cannot send SOCKS credentials, so browser sessions are only
+    isolated by port.
+    """
+
+    def __init__(self, port, isolation=TOR_STREAM_ISOLATION):
+        self.port = port
+        self.isolation = isolation
+        self.generation = 0
+        self.rotate()
+
+    def rotate(self):
+        self.username = secrets.token_hex(8)
+        self.password = secrets.token_hex(8)
+        self.reset_health()
+        self.generation += 1
+
+    @property
+    def host(self):
+        return self.port.host
+
+    @property
+    def socks_port(self):
+        return self.port.socks_port
+
+    @property
+    def proxy_url(self):
+        if self.isolation:
+            return f"socks5h://{self.username}:{self.password}@{self.host}:{self.socks_port}"
+        return f"socks5h://{self.host}:{self.socks_port}"
+
+    def proxies(self):
+        return {'http': self.proxy_url, 'https': self.proxy_url}
+
+class CircuitPool:
+    """Spreads crawler sessions over Tor SOCKS ports and keeps their circuits healthy.
+
+    Each session acquires its own Circuit on the best-scoring port and
+    reports the latency and outcome of every request. A circuit whose
+    error rate or latency crosses the configured limits moves to the
+    best-scoring port with fresh isolation credentials, and NEWNYM is sent
+    on the control port (rate limited, as Tor ignores requests more
+    frequent than every 10 s).
+    """
+
+    def __init__(self, socks_ports=TOR_SOCKS_PORTS, host=TOR_HOST, control_port=TOR_CONTROL_PORT,
+                 control_password=TOR_CONTROL_PASSWORD, isolation=TOR_STREAM_ISOLATION,
+                 max_error_rate=CIRCUIT_MAX_ERROR_RATE, max_latency=CIRCUIT_MAX_LATENCY,
+                 newnym_interval=NEWNYM_INTERVAL):
+        self.ports = [SocksPort(host, port) for port in socks_ports]
+        self.host = host
+        self.isolation = isolation
+        self.control_port = control_port
+        self.control_password = control_password
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.newnym_interval = newnym_interval
+        self.last_newnym = None
+        self.lock = threading.Lock()
+
+    def _best_port(self):
+        # Caller must hold self.lock.
+        return min(self.ports, key=lambda port: port.score(self.max_latency))
+
+    def acquire(self):
+        with self.lock:
+            port = self._best_port()
+            port.leases += 1
+            return Circuit(port, self.isolation)
+
+    def release(self, circuit):
+        with self.lock:
+            circuit.port.leases = max(0, circuit.port.leases - 1)
+
+    def report(self, circuit, seconds, ok):
+        with self.lock:
+            circuit.port.observe(seconds, ok)
+            circuit.observe(seconds, ok)
+            degraded = len(circuit.outcomes) >= MIN_SAMPLES and (
+                circuit.error_rate > self.max_error_rate
+                or (circuit.latency is not None and circuit.latency > self.max_latency))
+            if not degraded:
+                return
+            logging.warning(f"Circuit on SOCKS port {circuit.socks_port} degraded "
+                            f"(error rate {circuit.error_rate:.0%}, latency {circuit.latency or 0:.1f}s), renewing")
+            circuit.port.renewals += 1
+            circuit.port.leases = max(0, circuit.port.leases - 1)
+            circuit.port = self._best_port()
+            circuit.port.leases += 1
+            circuit.rotate()
+            CIRCUIT_RENEWALS.inc()
+            send_newnym = self.control_port and (
+                self.last_newnym is None or time.monotonic() - self.last_newnym >= self.newnym_interval)
+            if send_newnym:
+                self.last_newnym = time.monotonic()
+        if send_newnym:
+            self.request_newnym()
+
+    def request_newnym(self):
+        try:
+            with Controller.from_port(address=self.host, port=self.control_port) as controller:
+                controller.authenticate(password=self.control_password)
+                controller.signal(Signal.NEWNYM)
+            logging.info("Requested new Tor circuits (NEWNYM)")
+            return True
+        except Exception as e:
+            logging.warning(f"NEWNYM request on control port {self.control_port} failed: {e}")
+            return False
+
+    def stats(self):
+        with self.lock:
+            return [{
+                'socks_port': p.socks_port,
+                'leases': p.leases,
+                'latency': p.latency,
+                'error_rate': p.error_rate,
+                'renewals': p.renewals,
+            } for p in self.ports]
+
+TRANSPORT = CircuitPool()
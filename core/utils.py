@@ -1,4 +1,7 @@
+import math
 import random
+import re
+from collections import Counter
 from urllib.parse import urlparse, urlunparse
 from config import USER_AGENTS
 
@@ -22,3 +25,69 @@ def normalize_url(url):
     path = parsed.path.rstrip('/')
     normalized = urlunparse((scheme, netloc, path, '', '', ''))
     return normalized
+
+HEX_MIN_LENGTH = 8
+TOKEN_MIN_LENGTH = 16
+TOKEN_MIN_ENTROPY = 3.5
+TOKEN_SEPARATORS = ('-', '_', '.')
+# Random ids split into short runs of letters and digits; slugs into whole words
+MIXED_CASE_MAX_PIECE_LENGTH = 3.0
+SINGLE_CASE_TOKEN_MIN_LENGTH = 20
+SINGLE_CASE_MAX_PIECE_LENGTH = 4.0
+SINGLE_CASE_MIN_DIGIT_RUNS = 3
+MIXED_CASE_MIN_ENTROPY = 3.8
+HEX_RE = re.compile(r'^[0-9a-f]+$', re.I)
+UUID_RE = re.compile(r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$', re.I)
+DATE_RE = re.compile(r'^\d{4}[-_]\d{1,2}([-_]\d{1,2})?$')
+WORD_PIECE_RE = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|\d+')
+DIGIT_RUN_RE = re.compile(r'\d+')
+
+def segment_entropy(segment):
+    counts = Counter(segment)
+    length = len(segment)
+    return -sum(n / length * math.log2(n / length) for n in counts.values())
+
+def mean_piece_length(segment):
+    """Average length of the words, acronyms and numbers segment splits into."""
+    pieces = WORD_PIECE_RE.findall(segment)
+    return sum(map(len, pieces)) / len(pieces) if pieces else 0.0
+
+def mask_segment(segment):
+    if segment.isdigit():
+        return '{num}'
+    if DATE_RE.match(segment):
+        return '{date}'
+    if UUID_RE.match(segment):
+        return '{uuid}'
+    if len(segment) >= HEX_MIN_LENGTH and HEX_RE.match(segment) and any(ch.isdigit() for ch in segment):
+        return '{hex}'
+    bare = ''.join(ch for ch in segment if ch not in TOKEN_SEPARATORS)
+    if len(segment) < TOKEN_MIN_LENGTH or not bare.isalnum():
+        return segment
+    # Slugs such as monero-wallet-v2, johnsmith99 or Bitcoin2024Guide read as whole words;
+    # session ids and token_urlsafe values break into short runs of letters and digits
+    has_digit = any(ch.isdigit() for ch in bare)
+    upper = sum(ch.isupper() for ch in bare)
+    lower = sum(ch.islower() for ch in bare)
+    min_entropy = TOKEN_MIN_ENTROPY if has_digit else MIXED_CASE_MIN_ENTROPY
+    if segment_entropy(segment) < min_entropy:
+        return segment
+    pieces = mean_piece_length(segment)
+    if upper >= 3 and lower >= 3 and pieces <= MIXED_CASE_MAX_PIECE_LENGTH:
+        return '{token}'
+    if (has_digit and not (upper and lower) and bare == segment and len(segment) >= SINGLE_CASE_TOKEN_MIN_LENGTH
+            and (pieces <= SINGLE_CASE_MAX_PIECE_LENGTH
+                 or len(DIGIT_RUN_RE.findall(segment)) >= SINGLE_CASE_MIN_DIGIT_RUNS)):
+        # Lowercase base36 ids (PHPSESSID style) only switch between letters and digits
+        return '{token}'
+    return segment
+
+def url_pattern(url):
+    """Collapse url to host + path with ids, dates and random tokens masked.
+
+    http://x.onion/adhook/Files/ad-clicked/1/ThVF1LDKuSg1VCrtm6qsG9x0 becomes
+    x.onion/adhook/Files/ad-clicked/{num}/{token}.
+    """
+    parsed = urlparse(normalize_url(url))
+    segments = [mask_segment(segment) for segment in parsed.path.split('/') if segment]
+    return parsed.netloc + '/' + '/'.join(segments)
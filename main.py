@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 import json
@@ -5,17 +6,27 @@ import logging
 import threading
 import time
 from datetime import datetime
-from flask import Flask, render_template_string, send_from_directory
-from core import analyzer, threat_feed
+from flask import Flask, Response, jsonify, render_template_string, request, send_from_directory, stream_with_context
+from core import analyzer, dedup, threat_feed
 from core.utils import is_valid_onion_url, normalize_url
-from core.crawler import TorCrawler
-from config import KEYWORDS
+from core.crawler import CrawlScheduler
+from core.screenshot import ScreenshotWriter
+from core.store import MAX_PAGE_SIZE, ResultStore
+from core.frontier import CrawlState
+from core.metrics import PAGES, PROFILER, REGISTRY, span
+from config import KEYWORDS, CRAWL_WORKERS, CAPTURE_SCREENSHOTS, RESULTS_DB, PROFILER_ENABLED
 
 os.makedirs("outputs", exist_ok=True)
 os.makedirs("data/logs", exist_ok=True)
 logging.basicConfig(filename="data/logs/activity.log", level=logging.INFO, format='%(asctime)s %(levelname)s:%(message)s')
 
-RESULTS_FILE = 'outputs/results.json'
+DEFAULT_PAGE_SIZE = 50
+STREAM_POLL_INTERVAL = 1
+STREAM_KEEPALIVE = 15  # polls between keepalive comments
+store = ResultStore(RESULTS_DB)
+KEYWORD_MATCHER = analyzer.KeywordMatcher(KEYWORDS)
+screenshot_writer = ScreenshotWriter()
+duplicates = dedup.DuplicateIndex()
 
 app = Flask(__name__)
 
@@ -29,11 +40,22 @@ TEMPLATE = '''
         th, td { border: 1px solid #ddd; padding: 8px; text-align: left; }
         th { background-color: #4CAF50; color: white; }
         img { max-width: 150px; max-height: 100px; }
+        form, .pager { margin: 10px 0; }
     </style>
-    <meta http-equiv="refresh" content="10">
 </head>
 <body>
     <h1>Heckers' Darkweb OSINT Crawl Results</h1>
+    <form id="filters">
+        <input name="url" placeholder="URL contains">
+        <input name="keyword" placeholder="Keyword">
+        <select name="blacklisted">
+            <option value="">Any blacklist status</option>
+            <option value="1">Blacklisted</option>
+            <option value="0">Not blacklisted</option>
+        </select>
+        <label><input type="checkbox" name="duplicates" value="0"> Hide duplicates</label>
+        <button type="submit">Filter</button>
+    </form>
     <table>
         <thead>
             <tr>
@@ -46,47 +68,171 @@ TEMPLATE = '''
                 <th>Timestamp (UTC)</th>
             </tr>
         </thead>
-        <tbody>
-            {% for entry in results %}
-            <tr>
-                <td><a href="{{ entry.url }}" target="_blank">{{ entry.url }}</a></td>
-                <td>{{ 'Yes' if entry.active else 'No' }}</td>
-                <td>{{ 'Yes' if entry.blacklisted else 'No' }}</td>
-                <td>{{ entry.keywords_found | join(', ') }}</td>
-                <td>{{ entry.metadata.title }}</td>
-                <td>
-                    {% if entry.screenshot and entry.active %}
-                    <a href="/screenshots/{{ entry.screenshot_filename }}" target="_blank">
-                        <img src="/screenshots/{{ entry.screenshot_filename }}" alt="screenshot">
-                    </a>
-                    {% else %}
-                    N/A
-                    {% endif %}
-                </td>
-                <td>{{ entry.timestamp }}</td>
-            </tr>
-            {% endfor %}
-        </tbody>
+        <tbody id="results"></tbody>
     </table>
-    <p>Page refreshes every 10 seconds.</p>
+    <div class="pager">
+        <button id="prev">Previous</button>
+        <span id="page-info"></span>
+        <button id="next">Next</button>
+    </div>
+    <p id="live-status"></p>
+    <script>
+    const PER_PAGE = {{ per_page }};
+    const tbody = document.getElementById('results');
+    const form = document.getElementById('filters');
+    let page = 1, total = 0, lastId = 0, source = null;
+
+    function cell(row, content) {
+        const td = document.createElement('td');
+        if (content instanceof Node) td.appendChild(content); else td.textContent = content;
+        row.appendChild(td);
+    }
+
+    function renderRow(entry) {
+        const row = document.createElement('tr');
+        const link = document.createElement('a');
+        link.href = entry.url; link.target = '_blank'; link.textContent = entry.url;
+        cell(row, link);
+        cell(row, entry.active ? 'Yes' : 'No');
+        cell(row, entry.blacklisted ? 'Yes' : 'No');
+        cell(row, (entry.keywords_found || []).join(', '));
+        const title = (entry.metadata || {}).title || '';
+        cell(row, entry.duplicate_of ? title + ' (duplicate of ' + entry.duplicate_of + ')' : title);
+        if (entry.screenshot && entry.active) {
+            const a = document.createElement('a');
+            a.href = '/screenshots/' + encodeURIComponent(entry.screenshot_filename); a.target = '_blank';
+            const img = document.createElement('img');
+            img.src = a.href; img.alt = 'screenshot';
+            a.appendChild(img);
+            cell(row, a);
+        } else {
+            cell(row, 'N/A');
+        }
+        cell(row, entry.timestamp);
+        return row;
+    }
+
+    function filterParams() {
+        const params = new URLSearchParams();
+        for (const [key, value] of new FormData(form)) if (value) params.set(key, value);
+        return params;
+    }
+
+    function updatePager() {
+        const pages = Math.max(1, Math.ceil(total / PER_PAGE));
+        document.getElementById('page-info').textContent = 'Page ' + page + ' of ' + pages + ' (' + total + ' results)';
+        document.getElementById('prev').disabled = page <= 1;
+        document.getElementById('next').disabled = page >= pages;
+    }
+
+    async function load() {
+        const params = filterParams();
+        params.set('page', page); params.set('per_page', PER_PAGE);
+        const data = await (await fetch('/api/results?' + params)).json();
+        total = data.total;
+        tbody.replaceChildren(...data.results.map(renderRow));
+        lastId = Math.max(data.latest_id, lastId);
+        updatePager();
+        live();
+    }
+
+    function live() {
+        // Only the unfiltered first page receives pushed rows
+        const wanted = page === 1 && filterParams().toString() === '';
+        if (!wanted) { if (source) { source.close(); source = null; } return; }
+        if (source) return;
+        source = new EventSource('/api/stream?last_id=' + lastId);
+        source.onmessage = (event) => {
+            const entry = JSON.parse(event.data);
+            lastId = Math.max(lastId, entry.id);
+            tbody.insertBefore(renderRow(entry), tbody.firstChild);
+            while (tbody.children.length > PER_PAGE) tbody.removeChild(tbody.lastChild);
+            total += 1;
+            updatePager();
+        };
+        document.getElementById('live-status').textContent = 'New results appear automatically.';
+    }
+
+    form.addEventListener('submit', (event) => { event.preventDefault(); page = 1; load(); });
+    document.getElementById('prev').onclick = () => { page -= 1; load(); };
+    document.getElementById('next').onclick = () => { page += 1; load(); };
+    load();
+    </script>
 </body>
 </html>
 '''
 
+def _to_int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def _int_arg(name, default):
+    return _to_int(request.args.get(name, default), default)
+
 @app.route('/')
 def index():
-    results = []
-    if os.path.exists(RESULTS_FILE):
-        with open(RESULTS_FILE, 'r') as f:
-            for line in f:
-                try:
-                    entry = json.loads(line)
-                    entry['active'] = bool(entry.get('keywords_found') or entry.get('metadata', {}).get('title'))
-                    entry['screenshot_filename'] = os.path.basename(entry.get('screenshot', ''))
-                    results.append(entry)
-                except json.JSONDecodeError:
-                    continue
-    return render_template_string(TEMPLATE, results=results)
+    return render_template_string(TEMPLATE, per_page=DEFAULT_PAGE_SIZE)
+
+@app.route('/api/results')
+def api_results():
+    blacklisted = request.args.get('blacklisted')
+    page = max(1, _int_arg('page', 1))
+    per_page = min(max(1, _int_arg('per_page', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    results, total = store.query(
+        page=page,
+        per_page=per_page,
+        keyword=request.args.get('keyword') or None,
+        blacklisted=None if blacklisted in (None, '') else blacklisted == '1',
+        url=request.args.get('url') or None,
+        duplicates=request.args.get('duplicates') != '0',
+    )
+    return jsonify({'results': results, 'page': page, 'per_page': per_page, 'total': total,
+                    'latest_id': store.latest_id()})
+
+@app.route('/api/stream')
+def api_stream():
+    last_id = _int_arg('last_id', 0)
+    last_id = _to_int(request.headers.get('Last-Event-ID') or last_id, last_id)
+
+    def events(last_id):
+        idle = 0
+        while True:
+            rows = store.since(last_id)
+            for row in rows:
+                last_id = row['id']
+                yield f"id: {last_id}\ndata: {json.dumps(row)}\n\n"
+            if rows:
+                idle = 0
+                continue
+            idle += 1
+            if idle % STREAM_KEEPALIVE == 0:
+                yield ": keepalive\n\n"
+            time.sleep(STREAM_POLL_INTERVAL)
+
+    return Response(stream_with_context(events(last_id)), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache'})
+
+@app.route('/metrics')
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profile')
+def profile():
+    """Stacks sampled so far, in collapsed format for flamegraph.pl or speedscope."""
+    return Response(PROFILER.collapsed(), mimetype='text/plain')
+
+@app.route('/profile/start', methods=['POST'])
+def profile_start():
+    if request.args.get('reset') == '1':
+        PROFILER.reset()
+    return jsonify({'running': True, 'started': PROFILER.start()})
+
+@app.route('/profile/stop', methods=['POST'])
+def profile_stop():
+    stopped = PROFILER.stop()
+    return jsonify({'running': False, 'stopped': stopped, 'samples': PROFILER.samples})
 
 @app.route('/screenshots/<path:filename>')
 def screenshots(filename):
@@ -96,53 +242,103 @@ def run_dashboard():
     print("Starting Flask dashboard at http://127.0.0.1:5000")
     app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
 
-def handle_page(url, html):
-    logging.info(f"Analyzing {url}")
-    matched = analyzer.search_keywords(html, KEYWORDS)
-    meta = analyzer.extract_metadata(html)
-    is_malicious = threat_feed.check_blacklist(url)
-    screenshot_path = f"outputs/{url.split('//')[-1].replace('/', '_')}.png"
-
-    # Use crawler's screenshot method to reuse driver
-    success = crawler.capture_screenshot(url, screenshot_path)
-    if not success:
-        logging.warning(f"Failed to capture screenshot for {url}")
+def restore_duplicates():
+    """Rebuild the duplicate index from stored results when resuming a crawl."""
+    for url, digest, simhash in store.fingerprints():
+        duplicates.add(url, digest, int(simhash, 16))
 
+def handle_page(url, page):
+    parsed = page['parsed']
+    meta = {'title': parsed['title'], 'meta': parsed['meta']}
+    with span('blacklist'):
+        blacklist_hits = threat_feed.match_blacklist(url)
     result = {
         'url': url,
-        'keywords_found': list(matched.keys()),
+        'keywords_found': [],
+        'keyword_counts': {},
         'metadata': meta,
-        'blacklisted': is_malicious,
-        'screenshot': screenshot_path if success else '',
+        'blacklisted': bool(blacklist_hits),
+        'blacklist_hits': blacklist_hits,
+        'screenshot': '',
         'timestamp': datetime.utcnow().isoformat()
     }
 
-    with open(RESULTS_FILE, 'a') as f:
-        f.write(json.dumps(result) + '\n')
+    with span('fingerprint'):
+        fp = dedup.fingerprint(parsed['text'])
+        canonical = duplicates.check(url, *fp) if fp else None
+    if fp:
+        result['content_hash'], simhash = fp
+        result['simhash'] = format(simhash, '016x')
+        if canonical:
+            # Same template as a page we already analyzed: record the alias and move on
+            logging.info(f"{url} duplicates {canonical}, skipping analysis")
+            result['duplicate_of'] = canonical
+            with span('result_write'):
+                store.add(result)
+            PAGES.inc(outcome='duplicate')
+            return False
+
+    logging.info(f"Analyzing {url}")
+    # Capturing may re-render the page in Firefox; analyze whatever was screenshotted
+    screenshot = page['capture']() if page['capture'] else None
+    if screenshot:
+        screenshot_path = f"outputs/{url.split('//')[-1].replace('/', '_')}.png"
+        screenshot_writer.submit(screenshot_path, screenshot)
+        result['screenshot'] = screenshot_path
+    elif CAPTURE_SCREENSHOTS:
+        logging.warning(f"No screenshot captured for {url}")
+    parsed = page['parsed']
+    result['metadata'] = {'title': parsed['title'], 'meta': parsed['meta']}
+
+    with span('keyword_match'):
+        matched = KEYWORD_MATCHER.find(parsed['text'])
+    result['keywords_found'] = list(matched.keys())
+    result['keyword_counts'] = {kw: len(offsets) for kw, offsets in matched.items()}
+
+    with span('result_write'):
+        store.add(result)
+    PAGES.inc(outcome='analyzed')
+    return True
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <start_onion_url>")
+    parser = argparse.ArgumentParser(description="Heckers' Darkweb OSINT crawler")
+    parser.add_argument('start_url', nargs='?', help="onion URL to start crawling from")
+    parser.add_argument('--resume', action='store_true',
+                        help="continue the previous crawl from its saved frontier instead of starting over")
+    args = parser.parse_args()
+
+    if not args.start_url and not args.resume:
+        print("Usage: python main.py <start_onion_url> [--resume]")
         sys.exit(1)
 
-    start_url = sys.argv[1]
-    if not is_valid_onion_url(start_url):
+    start_url = args.start_url
+    if start_url and not is_valid_onion_url(start_url):
         print("[!] Invalid .onion URL.")
         sys.exit(1)
 
-    if os.path.exists(RESULTS_FILE):
-        os.remove(RESULTS_FILE)
+    if args.resume:
+        restore_duplicates()
+    else:
+        store.clear()
+    state = CrawlState(resume=args.resume)
+    if PROFILER_ENABLED:
+        PROFILER.start()
 
     # Start Flask dashboard in background thread
     dashboard_thread = threading.Thread(target=run_dashboard, daemon=True)
     dashboard_thread.start()
 
-    normalized_start_url = normalize_url(start_url)
-    crawler = TorCrawler()
+    normalized_start_url = normalize_url(start_url) if start_url else None
+    scheduler = CrawlScheduler(workers=CRAWL_WORKERS, state=state)
     try:
-        crawler.crawl(normalized_start_url, 0, handle_page)
-    finally:
-        crawler.close()
+        scheduler.crawl(normalized_start_url, handle_page)
+    except KeyboardInterrupt:
+        print("\n[!] Interrupted. Progress saved; continue with --resume.")
+        logging.info("Crawl interrupted; state checkpointed.")
+        screenshot_writer.flush()
+        sys.exit(0)
+    screenshot_writer.flush()
+    state.close()
 
     print("[✓] Crawling completed. Dashboard running at http://127.0.0.1:5000")
     logging.info("Crawling completed.")
@@ -153,5 +349,4 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         print("\nExiting...")
         logging.info("Exiting on user interrupt.")
-        crawler.close()
         sys.exit(0)
\ No newline at end of file
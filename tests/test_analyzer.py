@@ -0,0 +1,40 @@
+from core.analyzer import KeywordMatcher, parse_page
+
+def test_matcher_finds_whole_words_case_insensitively():
+    matcher = KeywordMatcher(['hack', 'Bitcoin', 'dark web'])
+    found = matcher.find('Hack the DARK WEB, pay in bitcoin; hacking and bitcoins are not matches')
+    assert found == {'hack': [0], 'dark web': [9], 'Bitcoin': [26]}
+
+def test_matcher_reports_every_occurrence():
+    assert KeywordMatcher(['scam']).find('scam? scam! Scam.') == {'scam': [0, 6, 12]}
+
+def test_matcher_handles_overlapping_keywords():
+    found = KeywordMatcher(['card', 'carding', 'ding']).find('carding forum')
+    assert found == {'carding': [0]}
+
+def test_matcher_offsets_survive_lowercase_expansion():
+    text = 'İstanbul hack'
+    found = KeywordMatcher(['hack']).find(text)
+    assert found == {'hack': [9]}
+    assert text[9:13] == 'hack'
+
+def test_parse_page_extracts_title_meta_links_and_text():
+    html = ('<html><head><title>Market</title><meta name="Description" content="vendors">'
+            '<script>var hidden = 1;</script></head>'
+            '<body><p>Hi</p><p>Visible</p><a href="/a">A</a><a href="b?x=1">B</a><a href="/a">again</a></body></html>')
+    parsed = parse_page(html, 'http://x.onion/dir/')
+    assert parsed['title'] == 'Market'
+    assert parsed['meta'] == {'description': 'vendors'}
+    assert parsed['links'] == ['http://x.onion/a', 'http://x.onion/dir/b?x=1']
+    assert parsed['text'] == 'Market Hi Visible A B again'
+
+def test_parse_page_skips_malformed_links():
+    html = '<title>T</title><a href="http://[abc/x">bad</a><a href="/ok">ok</a>'
+    parsed = parse_page(html, 'http://x.onion/')
+    assert parsed['title'] == 'T'
+    assert parsed['links'] == ['http://x.onion/ok']
+
+def test_parse_page_tolerates_empty_and_declaration_only_documents():
+    empty = {'title': '', 'meta': {}, 'links': [], 'text': ''}
+    assert parse_page('', 'http://x.onion/') == empty
+    assert parse_page('<?xml version="1.0" encoding="utf-8"?>', 'http://x.onion/') == empty
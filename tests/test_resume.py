@@ -0,0 +1,46 @@
+import importlib
+
+import pytest
+
+from core import dedup
+from core.store import ResultStore
+
+TEXT = "vendor listing for stolen credentials with escrow and pgp verified sellers only"
+OTHER_TEXT = "forum rules read before posting no doxxing no scams moderators ban on sight"
+
+def make_page(url, text):
+    return {'url': url, 'final_url': url, 'html': '', 'title': '', 'via': 'http', 'capture': None,
+            'parsed': {'title': '', 'meta': {}, 'links': [], 'text': text}}
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    main = importlib.import_module('main')
+    monkeypatch.setattr(main, 'store', ResultStore(str(tmp_path / 'results.db')))
+    monkeypatch.setattr(main, 'duplicates', dedup.DuplicateIndex())
+    monkeypatch.setattr(main, 'CAPTURE_SCREENSHOTS', False)
+    return main
+
+def resume(main):
+    # What `main.py --resume` does before crawling: a fresh index rebuilt from the store
+    main.duplicates = dedup.DuplicateIndex()
+    main.restore_duplicates()
+
+def test_refetched_page_is_not_a_duplicate_of_itself(app):
+    url = 'http://example.onion/p'
+    assert app.handle_page(url, make_page(url, TEXT)) is True
+    resume(app)
+
+    assert app.handle_page(url, make_page(url, TEXT)) is True
+    rows, _ = app.store.query()
+    assert [row.get('duplicate_of') for row in rows] == [None, None]
+
+def test_duplicates_are_still_detected_after_resume(app):
+    app.handle_page('http://example.onion/a', make_page('http://example.onion/a', TEXT))
+    app.handle_page('http://example.onion/b', make_page('http://example.onion/b', OTHER_TEXT))
+    resume(app)
+
+    assert app.handle_page('http://example.onion/c', make_page('http://example.onion/c', TEXT)) is False
+    rows, _ = app.store.query(duplicates=True)
+    assert rows[0]['url'] == 'http://example.onion/c'
+    assert rows[0]['duplicate_of'] == 'http://example.onion/a'
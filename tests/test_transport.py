@@ -0,0 +1,89 @@
+import socketserver
+import threading
+
+import pytest
+
+from core.transport import CircuitPool
+
+class FakeControlHandler(socketserver.StreamRequestHandler):
+    """Line-based stand-in for Tor's control port: just enough for stem to authenticate and signal."""
+
+    def handle(self):
+        for raw in self.rfile:
+            line = raw.decode().strip()
+            self.server.commands.append(line)
+            command = line.split(' ', 1)[0].upper()
+            if command == 'PROTOCOLINFO':
+                self.wfile.write(b'250-PROTOCOLINFO 1\r\n250-AUTH METHODS=NULL\r\n'
+                                 b'250-VERSION Tor="0.4.8.9"\r\n250 OK\r\n')
+            elif command == 'QUIT':
+                self.wfile.write(b'250 closing connection\r\n')
+                return
+            else:
+                self.wfile.write(b'250 OK\r\n')
+
+@pytest.fixture
+def control_port():
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), FakeControlHandler)
+    server.daemon_threads = True
+    server.commands = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def make_pool(ports, control_port=None):
+    return CircuitPool(socks_ports=ports, host='127.0.0.1', control_port=control_port, isolation=True,
+                       max_error_rate=0.5, max_latency=30, newnym_interval=10)
+
+def fail(pool, circuit, times):
+    for _ in range(times):
+        pool.report(circuit, 1.0, False)
+
+def test_sessions_on_one_port_get_separate_credentials():
+    pool = make_pool([9050])
+    circuits = [pool.acquire() for _ in range(4)]
+    assert len({circuit.proxy_url for circuit in circuits}) == 4
+    assert pool.stats()[0]['leases'] == 4
+
+def test_port_with_only_failures_is_not_preferred():
+    pool = make_pool([9050, 9052])
+    circuit = pool.acquire()
+    healthy = pool.acquire()
+    assert {circuit.socks_port, healthy.socks_port} == {9050, 9052}
+    fail(pool, circuit, 3)
+    pool.report(healthy, 2.0, True)
+    pool.release(circuit)
+    pool.release(healthy)
+
+    assert pool.acquire().socks_port == healthy.socks_port
+
+def test_degraded_circuit_moves_to_the_best_port():
+    pool = make_pool([9050, 9052])
+    circuit = pool.acquire()
+    other = pool.acquire()
+    pool.report(other, 1.0, True)
+    bad_port = circuit.socks_port
+    old_url, generation = circuit.proxy_url, circuit.generation
+
+    fail(pool, circuit, 5)
+
+    assert circuit.socks_port == other.socks_port != bad_port
+    assert circuit.generation == generation + 1
+    assert circuit.proxy_url != old_url
+    stats = {entry['socks_port']: entry for entry in pool.stats()}
+    assert stats[bad_port]['leases'] == 0
+    assert stats[bad_port]['renewals'] == 1
+    assert stats[other.socks_port]['leases'] == 2
+
+def test_degraded_circuit_requests_newnym_once_per_interval(control_port):
+    pool = make_pool([9050], control_port=control_port.server_address[1])
+    circuit = pool.acquire()
+
+    fail(pool, circuit, 5)
+    fail(pool, circuit, 5)
+
+    assert control_port.commands.count('SIGNAL NEWNYM') == 1
+    assert 'AUTHENTICATE' in control_port.commands[:3]
+    assert pool.stats()[0]['renewals'] == 2
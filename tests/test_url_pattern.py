@@ -0,0 +1,51 @@
+import base64
+import random
+
+import pytest
+
+from core.utils import mask_segment, url_pattern
+
+@pytest.mark.parametrize('url, pattern', [
+    ('http://x.onion/adhook/Files/ad-clicked/1/ThVF1LDKuSg1VCrtm6qsG9x0', 'x.onion/adhook/Files/ad-clicked/{num}/{token}'),
+    ('http://x.onion/s/sess1onXq9zLk2Pw/index', 'x.onion/s/{token}/index'),
+    ('http://x.onion/r/QwErTyUiOpAsDfGhJkLz', 'x.onion/r/{token}'),
+    ('http://x.onion/blob/deadbeef1234', 'x.onion/blob/{hex}'),
+    ('http://x.onion/s/382c65e4-8cee-41cd-abda-fbb8dfd86cda/index', 'x.onion/s/{uuid}/index'),
+    ('http://x.onion/s/9k2jf8a0q3lzm1x7c4vbn6yt0p', 'x.onion/s/{token}'),
+    ('http://x.onion/t/3q-Vw8_xKb0ZpL2mYc9R1g', 'x.onion/t/{token}'),
+    ('http://x.onion/archive/2024-05-01', 'x.onion/archive/{date}'),
+])
+def test_trap_segments_are_masked(url, pattern):
+    assert url_pattern(url) == pattern
+
+@pytest.mark.parametrize('url', [
+    'http://x.onion/market/listing/monero-wallet-v2',
+    'http://x.onion/user/johnsmith99',
+    'http://x.onion/wiki/Bitcoin2024Guide',
+    'http://x.onion/wiki/BitcoinMixingGuideForBeginners',
+    'http://x.onion/forum/thread_title_2023.html',
+    'http://x.onion/guides/How-To-Buy-Bitcoin-Safely-In-2024',
+    'http://x.onion/news/my-top-10-vpn-list-of-2024',
+    'http://x.onion/reviews/top10markets2024review',
+])
+def test_readable_slugs_are_kept(url):
+    assert url_pattern(url) == url.split('//', 1)[1]
+
+def test_random_tokens_share_one_pattern():
+    tokens = ['ThVF1LDKuSg1VCrtm6qsG9x0', 'p8ZqR2vLw9XkT4nB7cJm1YdF', 'Gh3kP9sXq2Lm8Vz4Rt7Wn1Bc']
+    assert {mask_segment(token) for token in tokens} == {'{token}'}
+
+def masked_share(ids):
+    return sum(mask_segment(value) == '{token}' for value in ids) / len(ids)
+
+def test_lowercase_session_ids_are_masked():
+    rng = random.Random(1)
+    alphabet = 'abcdefghijklmnopqrstuvwxyz0123456789'
+    ids = [''.join(rng.choice(alphabet) for _ in range(rng.randint(26, 32))) for _ in range(500)]
+    assert masked_share(ids) >= 0.95
+
+def test_urlsafe_tokens_are_masked():
+    rng = random.Random(2)
+    # Same alphabet and length as secrets.token_urlsafe(16)
+    ids = [base64.urlsafe_b64encode(rng.randbytes(16)).rstrip(b'=').decode() for _ in range(500)]
+    assert masked_share(ids) >= 0.95
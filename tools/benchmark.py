@@ -0,0 +1,438 @@
+"""Offline crawl benchmark.
+
+Serves a generated synthetic darknet site from a local HTTP server behind a
+local SOCKS5 stand-in for Tor, crawls it with the real TorCrawler pipeline
+(scheduler, analyzer, threat feed, dedup, results store) and exercises the
+dashboard routes. Prints a JSON report with pages/sec, per-stage latency
+percentiles, peak RSS and bytes written so runs can be compared across
+commits:
+
+    python tools/benchmark.py --hosts 5 --pages-per-host 40 --output bench.json
+"""
+import argparse
+import base64
+import hashlib
+import importlib
+import json
+import os
+import random
+import resource
+import select
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+WORDS = (
+    "market vendor escrow listing forum thread reply bitcoin monero wallet shipping stealth review "
+    "feedback price gram ounce dispute moderator admin rules guide tutorial mirror link index "
+    "search service hosting email secure privacy anonymous network relay bridge onion address "
+    "update news release archive download leak database dump account carding fraud scam hack wiki"
+).split()
+BOILERPLATE = (
+    "Welcome to the AdHook network the leading advertising platform for hidden services "
+    "Buy banner slots pay with bitcoin and reach thousands of visitors every day "
+    "Our ads are reviewed by moderators and rotated across partner sites automatically"
+)
+
+# --- synthetic site ---------------------------------------------------------
+
+def onion_name(seed, index):
+    digest = hashlib.sha512(f"{seed}-{index}".encode()).digest()
+    return base64.b32encode(digest).decode().lower()[:56] + '.onion'
+
+class SyntheticSite:
+    """Deterministic site graph: content pages, JS-rendered pages, near-duplicate
+    templates, ad-click trap URLs, static assets and cross-host links."""
+
+    def __init__(self, seed, hosts, pages_per_host):
+        self.seed = seed
+        self.hosts = [onion_name(seed, i) for i in range(hosts)]
+        self.pages_per_host = pages_per_host
+
+    def rng(self, host, path):
+        return random.Random(f"{self.seed}|{host}|{path}")
+
+    def words(self, rng, count):
+        return ' '.join(rng.choice(WORDS) for _ in range(count))
+
+    def token(self, rng):
+        alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        return ''.join(rng.choice(alphabet) for _ in range(24))
+
+    def link(self, host, path):
+        return f'<a href="http://{host}{path}">{path}</a>'
+
+    def page(self, title, body, links):
+        return (f"<html><head><title>{title}</title><meta name=\"description\" content=\"{title}\"></head>"
+                f"<body><h1>{title}</h1><p>{body}</p><ul>{''.join(f'<li>{l}</li>' for l in links)}</ul>"
+                f"</body></html>")
+
+    def render(self, host, path):
+        """Return (status, content_type, body) for host + path."""
+        if host not in self.hosts:
+            return 404, 'text/html', b'<html><body>unknown host</body></html>'
+        rng = self.rng(host, path)
+        parts = [p for p in path.split('/') if p]
+        n = self.pages_per_host
+        if not parts:
+            links = [self.link(host, f"/page/{k}") for k in range(min(n, 10))]
+            links += [self.link(host, f"/js/{k}") for k in range(2)]
+            links += [self.link(host, f"/dup/{k}") for k in range(5)]
+            links += [self.link(host, f"/ad/click/1/{self.token(rng)}") for _ in range(5)]
+            links += [self.link(host, "/static/logo.png")]
+            links += [self.link(other, "/") for other in self.hosts if other != host]
+            return 200, 'text/html', self.page(f"Index of {host[:8]}", self.words(rng, 80), links).encode()
+        kind = parts[0]
+        if kind == 'page' and len(parts) == 2 and parts[1].isdigit():
+            k = int(parts[1])
+            links = [self.link(host, f"/page/{(k + step) % n}") for step in (1, 7, 13)]
+            links.append(self.link(rng.choice(self.hosts), f"/page/{rng.randrange(n)}"))
+            return 200, 'text/html', self.page(f"Page {k}", self.words(rng, 300), links).encode()
+        if kind == 'js':
+            body = ("<html><head><title>App</title></head><body><div id=\"root\"></div>"
+                    "<noscript>Please enable JavaScript</noscript><script src=\"/static/app.js\"></script></body></html>")
+            return 200, 'text/html', body.encode()
+        if kind == 'dup':
+            links = [self.link(host, f"/dup/{int(parts[-1]) + 5}")] if parts[-1].isdigit() else []
+            return 200, 'text/html', self.page("AdHook", f"{BOILERPLATE} {parts[-1]}", links).encode()
+        if kind == 'ad':
+            links = [self.link(host, f"/ad/click/1/{self.token(rng)}") for _ in range(3)]
+            return 200, 'text/html', self.page("Dark Search", BOILERPLATE, links).encode()
+        if kind == 'static':
+            return 200, 'image/png', b'\x89PNG\r\n\x1a\n' + bytes(rng.randrange(256) for _ in range(2048))
+        return 404, 'text/html', b'<html><body>not found</body></html>'
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency + server.jitter * server.random.random())
+        if server.random.random() < server.failure_rate:
+            status, content_type, body = 503, 'text/html', b'<html><body>overloaded</body></html>'
+        else:
+            host = (self.headers.get('Host') or '').split(':')[0]
+            status, content_type, body = server.site.render(host, self.path.split('?')[0])
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_site_server(site, latency, jitter, failure_rate, seed):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), SiteHandler)
+    server.daemon_threads = True
+    server.site = site
+    server.latency = latency
+    server.jitter = jitter
+    server.failure_rate = failure_rate
+    server.random = random.Random(seed)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- SOCKS5 stand-in for Tor -----------------------------------------------
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("SOCKS client closed the connection")
+        data += chunk
+    return data
+
+class SocksHandler(socketserver.BaseRequestHandler):
+    """Minimal SOCKS5 server that routes every CONNECT to the synthetic site.
+
+    Accepts username/password auth so stream-isolation credentials work.
+    """
+
+    def handle(self):
+        client = self.request
+        try:
+            _, nmethods = _recv_exact(client, 2)
+            methods = _recv_exact(client, nmethods)
+            if 2 in methods:
+                client.sendall(b'\x05\x02')
+                _recv_exact(client, 1)
+                _recv_exact(client, _recv_exact(client, 1)[0])
+                _recv_exact(client, _recv_exact(client, 1)[0])
+                client.sendall(b'\x01\x00')
+            else:
+                client.sendall(b'\x05\x00')
+            _, cmd, _, atyp = _recv_exact(client, 4)
+            if atyp == 1:
+                _recv_exact(client, 4)
+            elif atyp == 3:
+                _recv_exact(client, _recv_exact(client, 1)[0])
+            else:
+                _recv_exact(client, 16)
+            _recv_exact(client, 2)
+            if cmd != 1:
+                client.sendall(b'\x05\x07\x00\x01' + b'\x00' * 6)
+                return
+            upstream = socket.create_connection(self.server.target)
+        except (ConnectionError, OSError):
+            return
+        client.sendall(b'\x05\x00\x00\x01' + b'\x00' * 6)
+        self.relay(client, upstream)
+
+    def relay(self, client, upstream):
+        sockets = [client, upstream]
+        try:
+            while True:
+                readable, _, _ = select.select(sockets, [], [], 30)
+                if not readable:
+                    return
+                for sock in readable:
+                    data = sock.recv(65536)
+                    if not data:
+                        return
+                    (upstream if sock is client else client).sendall(data)
+        except OSError:
+            return
+        finally:
+            upstream.close()
+
+class SocksServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start_socks_server(target):
+    server = SocksServer(('127.0.0.1', 0), SocksHandler)
+    server.target = target
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- measurement ------------------------------------------------------------
+
+class StageTimer:
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def wrap(self, stage, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.samples[stage].append(elapsed)
+        return timed
+
+    def record(self, stage, seconds):
+        with self.lock:
+            self.samples[stage].append(seconds)
+
+    def summary(self):
+        return {stage: summarize(values) for stage, values in sorted(self.samples.items())}
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def summarize(values):
+    ordered = sorted(values)
+    return {
+        'count': len(ordered),
+        'total_ms': round(sum(ordered) * 1000, 3),
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p90_ms': round(percentile(ordered, 0.90) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_feed(path, site, size, seed):
+    rng = random.Random(seed)
+    with open(path, 'w') as f:
+        f.write("# synthetic benchmark feed\n")
+        for i in range(size):
+            f.write(onion_name(f"feed-{seed}", i) + '\n')
+        # Blacklist one synthetic host so lookups also produce hits
+        f.write(rng.choice(site.hosts) + '\n')
+
+# --- benchmark --------------------------------------------------------------
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix='osint-bench-')
+    os.chdir(workdir)
+    os.makedirs('tools', exist_ok=True)
+
+    site = SyntheticSite(args.seed, args.hosts, args.pages_per_host)
+    write_feed('tools/feeds.txt', site, args.feed_size, args.seed)
+    site_server = start_site_server(site, args.latency_ms / 1000, args.jitter_ms / 1000,
+                                    args.failure_rate, args.seed)
+    socks_server = start_socks_server(site_server.server_address)
+
+    from core import analyzer, crawler, dedup, threat_feed
+    from core.frontier import CrawlState
+    from core.transport import CircuitPool
+    main = importlib.import_module('main')
+
+    crawler.CRAWL_LIMIT = args.crawl_limit
+    crawler.MAX_DEPTH = args.max_depth
+    timer = StageTimer()
+    find_keywords = analyzer.KeywordMatcher.find
+    crawler.TorCrawler.fetch_page = timer.wrap('fetch', crawler.TorCrawler.fetch_page)
+    crawler.parse_page = timer.wrap('parse', crawler.parse_page)
+    analyzer.KeywordMatcher.find = timer.wrap('keyword_match', analyzer.KeywordMatcher.find)
+    threat_feed.match_blacklist = timer.wrap('blacklist', threat_feed.match_blacklist)
+    dedup.fingerprint = timer.wrap('fingerprint', dedup.fingerprint)
+    main.store.add = timer.wrap('result_write', main.store.add)
+    handle_page = timer.wrap('handle_page', main.handle_page)
+
+    transport = CircuitPool(socks_ports=[socks_server.server_address[1]], control_port=None)
+    pages = []
+    duplicates = []
+    texts = []
+
+    def callback(url, page):
+        follow = handle_page(url, page)
+        (duplicates if follow is False else pages).append(url)
+        texts.append(page['parsed']['text'])
+        return follow
+
+    def session_factory():
+        return crawler.TorCrawler(fetch_mode=args.fetch_mode, screenshots=args.fetch_mode != 'http',
+                                  transport=transport)
+
+    state = CrawlState()
+    scheduler = crawler.CrawlScheduler(workers=args.workers, politeness_delay=args.politeness,
+                                       session_factory=session_factory, state=state)
+    start = time.perf_counter()
+    scheduler.crawl(f"http://{site.hosts[0]}/", callback)
+    main.screenshot_writer.flush()
+    elapsed = time.perf_counter() - start
+    state.close()
+    fetched = len(pages) + len(duplicates)
+
+    # Analyzer scaling: a large watchlist over the text of every fetched page
+    watchlist = [onion_name(f"kw-{args.seed}", i)[:12] for i in range(args.watchlist_size)] + WORDS
+    build_start = time.perf_counter()
+    large_matcher = analyzer.KeywordMatcher(watchlist)
+    timer.record('watchlist_build', time.perf_counter() - build_start)
+    for text in texts:
+        match_start = time.perf_counter()
+        find_keywords(large_matcher, text)
+        timer.record('keyword_match_large_watchlist', time.perf_counter() - match_start)
+
+    # Threat feed lookups against the large feed
+    lookup_urls = [f"http://{host}/page/{k}" for host in site.hosts for k in range(20)]
+    for url in lookup_urls:
+        lookup_start = time.perf_counter()
+        threat_feed.get_index().lookup(url)
+        timer.record('blacklist_lookup', time.perf_counter() - lookup_start)
+
+    # Dashboard routes
+    client = main.app.test_client()
+    _, total = main.store.query()
+    for route in ('/', '/api/results?page=1', '/api/results?page=2&per_page=25',
+                  '/api/results?keyword=bitcoin', '/api/results?blacklisted=1', '/api/results?duplicates=0', '/metrics'):
+        route_start = time.perf_counter()
+        response = client.get(route)
+        response.get_data()
+        timer.record('dashboard ' + route.split('?')[0], time.perf_counter() - route_start)
+    stream_start = time.perf_counter()
+    response = client.get('/api/stream?last_id=0')
+    next(response.response)
+    response.close()
+    timer.record('dashboard /api/stream first event', time.perf_counter() - stream_start)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'config': vars(args),
+        'crawl': {
+            'pages_fetched': fetched,
+            'pages_analyzed': len(pages),
+            'duplicates': len(duplicates),
+            'results_stored': total,
+            'elapsed_s': round(elapsed, 3),
+            'pages_per_sec': round(fetched / elapsed, 3) if elapsed else 0.0,
+            'circuits': transport.stats(),
+        },
+        'stages': timer.summary(),
+        'peak_rss_mb': peak_rss_mb(),
+        'bytes_written': {
+            'outputs': directory_size(os.path.join(workdir, 'outputs')),
+            'logs': directory_size(os.path.join(workdir, 'data')),
+        },
+    }
+
+    site_server.shutdown()
+    socks_server.shutdown()
+    os.chdir(REPO_ROOT)
+    if args.keep:
+        report['workdir'] = workdir
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline crawl benchmark against a synthetic hidden service")
+    parser.add_argument('--hosts', type=int, default=5, help="number of synthetic onion hosts")
+    parser.add_argument('--pages-per-host', type=int, default=40)
+    parser.add_argument('--latency-ms', type=float, default=50, help="base latency injected per request")
+    parser.add_argument('--jitter-ms', type=float, default=50, help="extra uniform random latency per request")
+    parser.add_argument('--failure-rate', type=float, default=0.02, help="fraction of requests answered with 503")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--politeness', type=float, default=0.0, help="per-host politeness delay in seconds")
+    parser.add_argument('--crawl-limit', type=int, default=200)
+    parser.add_argument('--max-depth', type=int, default=3)
+    parser.add_argument('--fetch-mode', choices=('http', 'auto', 'browser'), default='http',
+                        help="'auto' and 'browser' need Firefox and geckodriver")
+    parser.add_argument('--feed-size', type=int, default=100000, help="entries in the synthetic blacklist feed")
+    parser.add_argument('--watchlist-size', type=int, default=5000, help="keywords in the large-watchlist matcher")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help="write the JSON report to this file instead of stdout")
+    parser.add_argument('--keep', action='store_true', help="keep the temporary working directory")
+    return parser.parse_args(argv)
+
+if __name__ == '__main__':
+    args = parse_args()
+    report = run(args)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)